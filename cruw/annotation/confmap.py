@@ -0,0 +1,93 @@
+import numpy as np
+
+from cruw.mapping.coor_transform import pol2cart_ramap
+from cruw.eval.metrics import get_class_kappas
+from cruw.eval.rod.load_txt import read_txt_columns
+
+
+def generate_confmaps(frame_ids, ranges, angles, class_ids, n_frames, object_cfg, range_grid, angle_grid,
+                      dtype=np.float32, out=None, out_path=None, chunk_size=256):
+    """
+    Generate Gaussian confidence maps of all frames from object annotations in one batched pass.
+    The peak of an object at range s has the same spread as the OLS metric:
+        exp(-dist ** 2 / (2 * s ** 2 * kappa)), kappa = object_cfg.sizes[class] / 100,
+    where dist is the BEV distance between a map bin and the object.
+    Overlapping objects of the same class are merged with max.
+    :param frame_ids: frame ids of objects [n_obj]
+    :param ranges: ranges (m) of objects [n_obj]
+    :param angles: angles (rad) of objects [n_obj]
+    :param class_ids: class ids of objects [n_obj]
+    :param n_frames: number of frames
+    :param object_cfg: ObjectConfig
+    :param range_grid: range grid of the maps, e.g. range_grid_label
+    :param angle_grid: angle grid of the maps, e.g. angle_grid_label
+    :param dtype: dtype of the output when out is not given, e.g. np.float32 or np.float16
+    :param out: preallocated zero-filled output buffer [n_frames x n_class x r x a]
+    :param out_path: write the maps to this .npy file (memory-mapped) instead of an in-memory buffer
+    :param chunk_size: number of objects computed at once, which bounds the temporary memory
+    :return: confidence maps [n_frames x n_class x r x a]
+    """
+    out_shape = (n_frames, object_cfg.n_class, len(range_grid), len(angle_grid))
+    if out is None:
+        if out_path is not None:
+            # a new file reads as zeros, only the pages of frames with objects are written
+            out = np.lib.format.open_memmap(out_path, mode='w+', dtype=dtype, shape=out_shape)
+        else:
+            out = np.zeros(out_shape, dtype=dtype)
+    elif out.shape != out_shape:
+        raise ValueError("output buffer shape %s does not match %s" % (out.shape, out_shape))
+
+    frame_ids = np.asarray(frame_ids, dtype=np.int64)
+    class_ids = np.asarray(class_ids, dtype=np.int64)
+    valid = (frame_ids >= 0) & (frame_ids < n_frames) & (class_ids >= 0) & (class_ids < object_cfg.n_class)
+    order = np.lexsort((class_ids[valid], frame_ids[valid]))
+    frame_ids = frame_ids[valid][order]
+    class_ids = class_ids[valid][order]
+    obj_x, obj_z = pol2cart_ramap(np.asarray(ranges, dtype=np.float32)[valid][order],
+                                  np.asarray(angles, dtype=np.float32)[valid][order])
+    scales = np.asarray(ranges, dtype=np.float32)[valid][order]
+    kappas = get_class_kappas(object_cfg).astype(np.float32)[class_ids]
+
+    rng, agl = np.meshgrid(np.asarray(range_grid, dtype=np.float32), np.asarray(angle_grid, dtype=np.float32),
+                           indexing='ij')
+    grid_x, grid_z = pol2cart_ramap(rng, agl)
+
+    # one group per (frame, class), chunks only end at group boundaries
+    group_keys = frame_ids * object_cfg.n_class + class_ids
+    group_starts = np.flatnonzero(np.diff(group_keys, prepend=-1))
+    group_ends = np.append(group_starts[1:], len(group_keys))
+    group_id = 0
+    while group_id < len(group_starts):
+        start = group_starts[group_id]
+        last = max(np.searchsorted(group_ends, start + chunk_size, side='right') - 1, group_id)
+        end = group_ends[last]
+        dist2 = (grid_x - obj_x[start:end, None, None]) ** 2 + (grid_z - obj_z[start:end, None, None]) ** 2
+        spread = 2 * scales[start:end] ** 2 * kappas[start:end]
+        gauss = np.exp(-dist2 / spread[:, None, None])
+        maps = np.maximum.reduceat(gauss, group_starts[group_id:last + 1] - start, axis=0)
+        inds = group_starts[group_id:last + 1]
+        out[frame_ids[inds], class_ids[inds]] = maps
+        group_id = last + 1
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+def generate_confmaps_txt(txt_path, n_frames, dataset, dtype=np.float32, out=None, out_path=None, chunk_size=256):
+    """
+    Generate confidence maps of a sequence from a ROD2021 annotation txt file ('frame_id range azimuth class_name')
+    on the label grids (see generate_confmaps).
+    :param txt_path: annotation txt file path
+    :param n_frames: number of frames in the sequence
+    :param dataset: dataset object
+    :param dtype: dtype of the output when out is not given, e.g. np.float32 or np.float16
+    :param out: preallocated zero-filled output buffer [n_frames x n_class x r x a]
+    :param out_path: write the maps to this .npy file (memory-mapped) instead of an in-memory buffer
+    :param chunk_size: number of objects computed at once
+    :return: confidence maps [n_frames x n_class x r x a]
+    """
+    columns = read_txt_columns(txt_path, dataset, roi_filter=False)
+    return generate_confmaps(columns['frame_id'], columns['range'], columns['angle'], columns['class_id'],
+                             n_frames, dataset.object_cfg, dataset.range_grid_label, dataset.angle_grid_label,
+                             dtype=dtype, out=out, out_path=out_path, chunk_size=chunk_size)
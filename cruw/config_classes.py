@@ -1,7 +1,4 @@
-import os
-import yaml
-
-from cruw.utils.parse_cam_calib import parse_cam_matrices
+from cruw.io.calib import load_cam_calib_file, CamCalibs
 
 
 class SensorConfig:
@@ -35,55 +32,16 @@ class SensorConfig:
         )
 
     def load_cam_calib(self, calib_yaml_l, calib_yaml_r=None):
-        with open(calib_yaml_l, "r") as stream:
-            data = yaml.safe_load(stream)
-            K, D, R, P = parse_cam_matrices(data)
-            self.calib_cfg['cam_0'] = {}
-            self.calib_cfg['cam_0']['camera_matrix'] = K
-            self.calib_cfg['cam_0']['distortion_coefficients'] = D
-            self.calib_cfg['cam_0']['rectification_matrix'] = R
-            self.calib_cfg['cam_0']['projection_matrix'] = P
+        self.calib_cfg['cam_0'] = dict(load_cam_calib_file(calib_yaml_l))
         if calib_yaml_r is not None:
-            with open(calib_yaml_r, "r") as stream:
-                data = yaml.safe_load(stream)
-                K, D, R, P = parse_cam_matrices(data)
-                self.calib_cfg['cam_1'] = {}
-                self.calib_cfg['cam_1']['camera_matrix'] = K
-                self.calib_cfg['cam_1']['distortion_coefficients'] = D
-                self.calib_cfg['cam_1']['rectification_matrix'] = R
-                self.calib_cfg['cam_1']['projection_matrix'] = P
-
-    def load_cam_calibs(self, data_root, calib_yaml_paths):
-        self.calib_cfg['cam_calib'] = {}
-        self.calib_cfg['cam_calib']['load_success'] = True
-        for date in calib_yaml_paths.keys():
-            self.calib_cfg['cam_calib'][date] = {}
-            n_paths = len(calib_yaml_paths[date])
-            calib_yaml_path = os.path.join(data_root, calib_yaml_paths[date][0])
-            if os.path.exists(calib_yaml_path):
-                with open(calib_yaml_path, "r") as stream:
-                    data = yaml.safe_load(stream)
-                    K, D, R, P = parse_cam_matrices(data)
-                    self.calib_cfg['cam_calib'][date]['cam_0'] = {}
-                    self.calib_cfg['cam_calib'][date]['cam_0']['camera_matrix'] = K
-                    self.calib_cfg['cam_calib'][date]['cam_0']['distortion_coefficients'] = D
-                    self.calib_cfg['cam_calib'][date]['cam_0']['rectification_matrix'] = R
-                    self.calib_cfg['cam_calib'][date]['cam_0']['projection_matrix'] = P
-            else:
-                self.calib_cfg['cam_calib']['load_success'] = False
-            if n_paths == 2:
-                calib_yaml_path = os.path.join(data_root, calib_yaml_paths[date][1])
-                if os.path.exists(calib_yaml_path):
-                    with open(calib_yaml_path, "r") as stream:
-                        data = yaml.safe_load(stream)
-                        K, D, R, P = parse_cam_matrices(data)
-                        self.calib_cfg['cam_calib'][date]['cam_1'] = {}
-                        self.calib_cfg['cam_calib'][date]['cam_1']['camera_matrix'] = K
-                        self.calib_cfg['cam_calib'][date]['cam_1']['distortion_coefficients'] = D
-                        self.calib_cfg['cam_calib'][date]['cam_1']['rectification_matrix'] = R
-                        self.calib_cfg['cam_calib'][date]['cam_1']['projection_matrix'] = P
-                else:
-                    self.calib_cfg['cam_calib']['load_success'] = False
+            self.calib_cfg['cam_1'] = dict(load_cam_calib_file(calib_yaml_r))
+
+    def load_cam_calibs(self, data_root, calib_yaml_paths, binary_cache=False):
+        """
+        Set up camera calibrations by date in calib_cfg['cam_calib'].
+        Each calibration file is parsed once (see cruw.io.calib), on the first access of a date using it.
+        """
+        self.calib_cfg['cam_calib'] = CamCalibs(data_root, calib_yaml_paths, binary_cache=binary_cache)
 
 
 class ObjectConfig:
@@ -1,33 +1,159 @@
 import os
 import json
+import threading
+import numpy as np
 
 from cruw.config_classes import SensorConfig, ObjectConfig
-from cruw.mapping import confmap2ra, labelmap2ra, get_xzgrid
+from cruw.mapping import confmap2ra, labelmap2ra, get_xzgrid, rf2rfcart_lut, rfcart2rf_lut
+from cruw.mapping.resample import ResampleOperator
+from cruw.io.manifest import DatasetManifest
+from cruw.io.radar import load_chirp, load_chirps
+from cruw.io.packed import PackedSequence
+from cruw.io.image import load_image
+from cruw.io.cache import get_frame_cache, load_image_cached
+from cruw.io.prefetch import FrameIterator
+from cruw.io.window import WindowIterator
+
+
+_shared_states = {}
+_shared_states_lock = threading.RLock()
+
+
+def get_shared_state(data_root, sensor_config_name, object_config_name):
+    """
+    Process-wide memo of the configs and grids of CRUW objects, keyed by (data_root, config names),
+    so that creating CRUW objects repeatedly (e.g. in DataLoader workers or per task) is cheap.
+    :return: dict of the attributes built so far
+    """
+    key = (os.path.abspath(data_root), sensor_config_name, object_config_name)
+    with _shared_states_lock:
+        return _shared_states.setdefault(key, {})
+
+
+def clear_shared_states():
+    """Clear the memo, e.g. after editing the config files."""
+    with _shared_states_lock:
+        _shared_states.clear()
 
 
 class CRUW:
-    """ Dataset class for CRUW. """
+    """
+    Dataset class for CRUW.
+    Configs and grids are built on first access and shared by all CRUW objects in the process
+    with the same data_root and config names, so they should be treated as read-only.
+    Assigning them (e.g. dataset.range_grid = ...) only changes this object, and assigning sensor_cfg
+    makes this object build its own grids from the new config.
+    """
 
     def __init__(self,
                  data_root: str,
                  sensor_config_name: str = 'sensor_config',
                  object_config_name: str = 'object_config'):
         self.data_root = data_root
-        self.sensor_cfg = self._load_sensor_config(sensor_config_name)
-        self.dataset = self.sensor_cfg.dataset
-        self.object_cfg = self._load_object_config(object_config_name)
+        self.sensor_config_name = sensor_config_name
+        self.object_config_name = object_config_name
+        self._shared = get_shared_state(data_root, sensor_config_name, object_config_name)
+        self._rf2rfcart_lut = None
+        self._rfcart2rf_lut = None
+        self._resample_ops = {}
+        self._manifest = None
+        self._packed_seqs = {}
+
+    def _get_shared(self, name, build_fn):
+        """Get a lazily built attribute, an attribute assigned on this object overrides the shared memo."""
+        if name in self.__dict__:
+            return self.__dict__[name]
+        shared = self._shared
+        if name not in shared:
+            with _shared_states_lock:
+                if name not in shared:
+                    shared[name] = build_fn()
+        return shared[name]
+
+    def _set_override(self, name, value):
+        """Assign an attribute on this object only, the LUTs and operators built from the old grids are dropped."""
+        self.__dict__[name] = value
+        self._rf2rfcart_lut = None
+        self._rfcart2rf_lut = None
+        self._resample_ops = {}
+
+    @property
+    def sensor_cfg(self) -> SensorConfig:
+        return self._get_shared('sensor_cfg', lambda: self._load_sensor_config(self.sensor_config_name))
+
+    @sensor_cfg.setter
+    def sensor_cfg(self, value):
+        # the grids are built from sensor_cfg, so this object stops sharing them with others
+        shared = self._shared
+        self._shared = dict((name, shared[name]) for name in ('object_cfg',) if name in shared)
+        self._set_override('sensor_cfg', value)
+
+    @property
+    def object_cfg(self) -> ObjectConfig:
+        return self._get_shared('object_cfg', lambda: self._load_object_config(self.object_config_name))
+
+    @object_cfg.setter
+    def object_cfg(self, value):
+        self._set_override('object_cfg', value)
+
+    @property
+    def dataset(self):
+        return self.sensor_cfg.dataset
+
+    @property
+    def range_grid(self):
+        return self._get_shared('range_grid', lambda: confmap2ra(self.sensor_cfg.radar_cfg, name='range'))
+
+    @range_grid.setter
+    def range_grid(self, value):
+        self._set_override('range_grid', value)
 
-        self.range_grid = confmap2ra(self.sensor_cfg.radar_cfg, name='range')
-        self.angle_grid = confmap2ra(self.sensor_cfg.radar_cfg, name='angle')
+    @property
+    def angle_grid(self):
+        return self._get_shared('angle_grid', lambda: confmap2ra(self.sensor_cfg.radar_cfg, name='angle'))
+
+    @angle_grid.setter
+    def angle_grid(self, value):
+        self._set_override('angle_grid', value)
+
+    @property
+    def range_grid_label(self):
+        if 'range_grid_label' in self.__dict__:
+            return self.__dict__['range_grid_label']
+        return self._get_shared('label_grids', self._build_label_grids)[0]
+
+    @range_grid_label.setter
+    def range_grid_label(self, value):
+        self._set_override('range_grid_label', value)
+
+    @property
+    def angle_grid_label(self):
+        if 'angle_grid_label' in self.__dict__:
+            return self.__dict__['angle_grid_label']
+        return self._get_shared('label_grids', self._build_label_grids)[1]
+
+    @angle_grid_label.setter
+    def angle_grid_label(self, value):
+        self._set_override('angle_grid_label', value)
+
+    @property
+    def xz_grid(self):
+        return self._get_shared('xz_grid', lambda: get_xzgrid(self.sensor_cfg.radar_cfg['xz_dim'],
+                                                              self.sensor_cfg.radar_cfg['z_max']))
+
+    @xz_grid.setter
+    def xz_grid(self, value):
+        self._set_override('xz_grid', value)
+
+    def _build_label_grids(self):
         try:
-            self.range_grid_label = labelmap2ra(self.sensor_cfg.radar_cfg, name='range')
-            self.angle_grid_label = labelmap2ra(self.sensor_cfg.radar_cfg, name='angle')
+            range_grid_label = labelmap2ra(self.sensor_cfg.radar_cfg, name='range')
+            angle_grid_label = labelmap2ra(self.sensor_cfg.radar_cfg, name='angle')
         except:
-            self.range_grid_label = None
-            self.angle_grid_label = None
+            range_grid_label = None
+            angle_grid_label = None
             print('not using range_grid_label and angle_grid_label.')
-
-        self.xz_grid = get_xzgrid(self.sensor_cfg.radar_cfg['xz_dim'], self.sensor_cfg.radar_cfg['z_max'])
+        return range_grid_label, angle_grid_label
 
     def __str__(self):
         print_log = '<CRUW Dataset Object>\n'
@@ -42,6 +168,210 @@ class CRUW:
         print_log += "Coor mappings:  %s\n" % mapping_flag
         return print_log
 
+    def __getstate__(self):
+        # cached LUTs and manifest are large and cheap to recover, do not send them to worker processes
+        state = self.__dict__.copy()
+        state['_rf2rfcart_lut'] = None
+        state['_rfcart2rf_lut'] = None
+        state['_resample_ops'] = {}
+        state['_manifest'] = None
+        state['_packed_seqs'] = {}
+        state['_shared'] = dict(self._shared)
+        return state
+
+    def __setstate__(self, state):
+        if 'sensor_cfg' in state:
+            # the sender built its own grids from an assigned sensor_cfg, keep them out of the memo
+            self.__dict__.update(state)
+            return
+        # attributes already built by the sender seed the memo of this process
+        shared = get_shared_state(state['data_root'], state['sensor_config_name'], state['object_config_name'])
+        with _shared_states_lock:
+            for name, value in state['_shared'].items():
+                shared.setdefault(name, value)
+        state['_shared'] = shared
+        self.__dict__.update(state)
+
+    @property
+    def manifest(self) -> DatasetManifest:
+        """
+        Dataset manifest (splits, sequences, frame numbers and file names), loaded on first use.
+        It is saved next to data_root and rebuilt when the dataset folders change.
+        """
+        if self._manifest is None:
+            self._manifest = DatasetManifest.load(self.data_root, self.sensor_cfg)
+        return self._manifest
+
+    def get_rf2rfcart_lut(self):
+        """
+        Get the sampling LUT for rf2rfcart, which is computed once and cached on this object.
+        :return: (inds, weights) LUT
+        """
+        if self._rf2rfcart_lut is None:
+            self._rf2rfcart_lut = rf2rfcart_lut(self.range_grid, self.angle_grid, self.xz_grid)
+        return self._rf2rfcart_lut
+
+    def get_rfcart2rf_lut(self):
+        """
+        Get the sampling LUT for rfcart2rf (cart coordinates back to RF images),
+        which is computed once and cached on this object.
+        :return: (inds, weights) LUT
+        """
+        if self._rfcart2rf_lut is None:
+            self._rfcart2rf_lut = rfcart2rf_lut(self.range_grid, self.angle_grid, self.xz_grid)
+        return self._rfcart2rf_lut
+
+    def get_grids(self, name):
+        """
+        Get the grids of a coordinate system.
+        :param name: 'confmap' (range_grid, angle_grid), 'label' (range_grid_label, angle_grid_label)
+                     or 'bev' (xz_grid)
+        :return: grid type ('ra' or 'xz') and grids
+        """
+        if name == 'confmap':
+            return 'ra', (self.range_grid, self.angle_grid)
+        if name == 'label':
+            return 'ra', (self.range_grid_label, self.angle_grid_label)
+        if name == 'bev':
+            return 'xz', self.xz_grid
+        raise ValueError("unknown grid %s" % name)
+
+    def get_resample_operator(self, src, dst, cache_path=None) -> ResampleOperator:
+        """
+        Get the sparse bilinear resampling operator between two grids, which is built once and cached on this object.
+        :param src: source grid name, 'confmap', 'label' or 'bev'
+        :param dst: destination grid name
+        :param cache_path: .npz file to load the operator from, it is built and saved there if missing
+                           or built from different grids
+        :return: ResampleOperator
+        """
+        if (src, dst) not in self._resample_ops:
+            src_type, src_grids = self.get_grids(src)
+            dst_type, dst_grids = self.get_grids(dst)
+            if cache_path is not None:
+                op = ResampleOperator.load_or_build(cache_path, src_type, src_grids, dst_type, dst_grids)
+            else:
+                op = ResampleOperator.build(src_type, src_grids, dst_type, dst_grids)
+            self._resample_ops[(src, dst)] = op
+        return self._resample_ops[(src, dst)]
+
+    def get_packed_seq(self, seq_name):
+        """
+        Get the reader of a packed radar sequence.
+        :param seq_name: sequence name
+        :return: PackedSequence, None if the sequence is not packed
+        """
+        if seq_name not in self._packed_seqs:
+            packed = None
+            if self.manifest.is_packed(seq_name):
+                packed = PackedSequence(self.manifest.get_packed_path(seq_name))
+            self._packed_seqs[seq_name] = packed
+        return self._packed_seqs[seq_name]
+
+    def load_radar(self, seq_name, frame_ids, chirp_ids=None, out=None):
+        """
+        Load radar data of a sequence with memory-mapped chirp files, or from the packed
+        sequence file if the sequence is packed (see cruw.io.packed).
+        For a single frame and chirp without out buffer, a zero-copy read-only memmap [r x a x 2] is returned.
+        Otherwise, data is copied into out [n_frames x n_chirps x r x a x 2] (allocated if None).
+        :param seq_name: sequence name
+        :param frame_ids: frame id or list of frame ids
+        :param chirp_ids: chirp id or list of chirp ids, radar_cfg['chirp_ids'] by default
+        :param out: preallocated output buffer
+        :return: radar data
+        """
+        if chirp_ids is None:
+            chirp_ids = self.sensor_cfg.radar_cfg['chirp_ids']
+        packed = self.get_packed_seq(seq_name)
+        if np.isscalar(frame_ids) and np.isscalar(chirp_ids) and out is None:
+            if packed is not None:
+                return packed.get_chirp(frame_ids, chirp_ids)
+            return load_chirp(self.manifest.get_chirp_path(seq_name, frame_ids, chirp_ids))
+        frame_ids = np.atleast_1d(frame_ids)
+        chirp_ids = np.atleast_1d(chirp_ids)
+        if packed is not None:
+            return packed.load(frame_ids, chirp_ids, out=out)
+        chirp_paths = [[self.manifest.get_chirp_path(seq_name, frame_id, chirp_id) for chirp_id in chirp_ids]
+                       for frame_id in frame_ids]
+        return load_chirps(chirp_paths, out=out)
+
+    def load_frame(self, seq_name, frame_id, modalities=('radar', 'cam_0'), chirp_ids=None, use_cache=True):
+        """
+        Load the data of one frame.
+        :param seq_name: sequence name
+        :param frame_id: frame id
+        :param modalities: 'radar' for radar chirps [n_chirps x r x a x 2], 'cam_0' for the camera image
+        :param chirp_ids: chirp ids, radar_cfg['chirp_ids'] by default
+        :param use_cache: load through the shared frame cache (see cruw.io.cache), cached arrays are read-only
+        :return: dict with 'frame_id' and one entry per modality
+        """
+        if chirp_ids is None:
+            chirp_ids = self.sensor_cfg.radar_cfg['chirp_ids']
+        frame = dict(frame_id=frame_id)
+        for modality in modalities:
+            if modality == 'radar':
+                if use_cache:
+                    chirp_folder = self.sensor_cfg.radar_cfg['chirp_folder']
+                    seq_path = os.path.abspath(self.manifest.get_seq_path(seq_name))
+                    frame['radar'] = np.stack([get_frame_cache().get_or_load(
+                        (seq_path, chirp_folder, frame_id, chirp_id),
+                        lambda chirp_id=chirp_id: self.load_radar(seq_name, frame_id, chirp_id))
+                        for chirp_id in chirp_ids])
+                else:
+                    frame['radar'] = self.load_radar(seq_name, [frame_id], chirp_ids)[0]
+            elif modality == 'cam_0':
+                image_path = self.manifest.get_image_path(seq_name, frame_id)
+                frame['cam_0'] = load_image_cached(image_path) if use_cache else load_image(image_path)
+            else:
+                raise ValueError("unknown modality %s" % modality)
+        return frame
+
+    def iter_frames(self, seq_name, modalities=('radar', 'cam_0'), frame_ids=None, chirp_ids=None,
+                    prefetch=4, workers=2, use_cache=True) -> FrameIterator:
+        """
+        Iterate the frames of a sequence in order, reading ahead with a thread pool.
+        The returned iterator reports the time spent waiting for data in 'stall_time'.
+        :param seq_name: sequence name
+        :param modalities: modalities to load, see load_frame
+        :param frame_ids: frame ids to iterate, all frames by default
+        :param chirp_ids: chirp ids, radar_cfg['chirp_ids'] by default
+        :param prefetch: number of frames to read ahead
+        :param workers: number of loader threads
+        :param use_cache: load through the shared frame cache
+        :return: FrameIterator yielding frame dicts
+        """
+        if frame_ids is None:
+            frame_ids = range(self.manifest.get_n_frames(seq_name))
+        # resolve lazily loaded state here instead of in the loader threads
+        self.get_packed_seq(seq_name)
+
+        def load_fn(frame_id):
+            return self.load_frame(seq_name, frame_id, modalities, chirp_ids, use_cache)
+
+        return FrameIterator(load_fn, frame_ids, prefetch=prefetch, workers=workers)
+
+    def iter_windows(self, seq_name, win_size, stride=1, frame_ids=None, chirp_ids=None) -> WindowIterator:
+        """
+        Iterate sliding windows of radar frames [win_size x n_chirps x r x a x 2] of a sequence.
+        Frames shared by consecutive windows are kept in a ring buffer and loaded only once.
+        The windows are views of the buffer, which are overwritten in the following steps.
+        :param seq_name: sequence name
+        :param win_size: number of frames in a window
+        :param stride: number of frames between the starts of two windows
+        :param frame_ids: frame ids to iterate, all frames by default
+        :param chirp_ids: chirp ids, radar_cfg['chirp_ids'] by default
+        :return: WindowIterator yielding radar windows
+        """
+        if frame_ids is None:
+            frame_ids = range(self.manifest.get_n_frames(seq_name))
+        if chirp_ids is None:
+            chirp_ids = self.sensor_cfg.radar_cfg['chirp_ids']
+
+        def load_fn(window_frame_ids, out):
+            return self.load_radar(seq_name, window_frame_ids, chirp_ids, out=out)
+
+        return WindowIterator(load_fn, frame_ids, win_size, stride=stride)
+
     def _load_sensor_config(self, config_name) -> SensorConfig:
         """
         Create a SensorConfig class for CRUW dataset.
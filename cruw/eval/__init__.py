@@ -1,2 +1,4 @@
 from .rod.eval_rod2021 import evaluate_rod2021
 from .rod.eval_rodnet import evaluate_rodnet_seq
+from .rod.online_eval import RODEvaluator
+from .rod.post_process import post_process_confmaps, write_rodnet_res
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 from cruw.mapping.coor_transform import pol2cart_ramap
 
@@ -95,6 +96,41 @@ def get_ols_xy(obj1, obj2, dataset):
     return ols(dist, s, kappa)
 
 
+def get_class_kappas(object_cfg):
+    """
+    Get OLS kappa of each class from object sizes.
+    :param object_cfg: ObjectConfig
+    :return: kappa array [n_class]
+    """
+    return np.array([object_cfg.sizes[class_str] / 100 for class_str in object_cfg.classes])
+
+
+def get_ols_matrix(rng1, agl1, cls1, rng2, agl2, cls2, kappas):
+    """
+    Calculate OLS between two sets of objects with broadcasting.
+    Each element is the same as get_ols_ra(obj1, obj2): scale is taken from object 1 and
+    kappa from the larger class id of the pair.
+    Leading axes are batch axes, e.g. [n_frames x n1] inputs give [n_frames x n1 x n2] OLS.
+    :param rng1: ranges of objects 1 [... x n1]
+    :param agl1: angles of objects 1 [... x n1]
+    :param cls1: class ids of objects 1 [... x n1]
+    :param rng2: ranges of objects 2 [... x n2]
+    :param agl2: angles of objects 2 [... x n2]
+    :param cls2: class ids of objects 2 [... x n2]
+    :param kappas: kappa of each class from get_class_kappas
+    :return: OLS matrix [... x n1 x n2]
+    """
+    x1, y1 = pol2cart_ramap(np.asarray(rng1, dtype=float)[..., :, None], np.asarray(agl1, dtype=float)[..., :, None])
+    x2, y2 = pol2cart_ramap(np.asarray(rng2, dtype=float)[..., None, :], np.asarray(agl2, dtype=float)[..., None, :])
+    dx = x1 - x2
+    dy = y1 - y2
+    dist = (dx ** 2 + dy ** 2) ** 0.5
+    s = (x1 ** 2 + y1 ** 2) ** 0.5
+    kappa = kappas[np.maximum(np.asarray(cls1, dtype=int)[..., :, None], np.asarray(cls2, dtype=int)[..., None, :])]
+    e = dist ** 2 / 2 / (s ** 2 * kappa)
+    return np.exp(-e)
+
+
 def ols(dist, scale, kappa):
     """Calculate OLS based on distance, scale and kappa."""
     e = dist ** 2 / 2 / (scale ** 2 * kappa)
@@ -0,0 +1,72 @@
+import numpy as np
+
+DET_COLUMNS = ('id', 'frame_id', 'class_id', 'range', 'angle', 'score')
+DET_DTYPES = dict(id=np.int32, frame_id=np.int32, class_id=np.int8,
+                  range=np.float32, angle=np.float32, score=np.float32)
+
+
+class DetTable:
+    """
+    Detections (or ground truths) of a sequence stored as contiguous columns.
+    Rows are sorted by (frame_id, class_id) and by descending score within each (frame_id, class_id),
+    and an offsets index gives the rows of any (frame_id, class_id) in O(1).
+    """
+
+    def __init__(self, columns, n_frame, n_class):
+        """
+        :param columns: dict of 1d arrays with keys in DET_COLUMNS, in any order
+        :param n_frame: number of frames
+        :param n_class: number of classes
+        """
+        self.n_frame = n_frame
+        self.n_class = n_class
+        keys = columns['frame_id'].astype(np.int64) * n_class + columns['class_id']
+        if len(keys) and (keys.min() < 0 or keys.max() >= n_frame * n_class):
+            raise ValueError("frame_id or class_id out of range")
+        # lexsort is stable: (frame_id, class_id) first, then descending score, then id
+        order = np.lexsort((columns['id'], -columns['score'], keys))
+        self.columns = {name: np.ascontiguousarray(columns[name][order], dtype=DET_DTYPES[name])
+                        for name in DET_COLUMNS}
+        counts = np.bincount(keys, minlength=n_frame * n_class)
+        self.offsets = np.zeros(n_frame * n_class + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def __getitem__(self, key):
+        """
+        Get the detections of a (frame_id, class_id) pair.
+        :param key: (frame_id, class_id)
+        :return: dict of column views
+        """
+        start, end = self.slice(*key)
+        return {name: col[start:end] for name, col in self.columns.items()}
+
+    def slice(self, frame_id, class_id):
+        """Row range [start, end) of a (frame_id, class_id) pair."""
+        if not (0 <= frame_id < self.n_frame and 0 <= class_id < self.n_class):
+            raise KeyError((frame_id, class_id))
+        key = frame_id * self.n_class + class_id
+        return int(self.offsets[key]), int(self.offsets[key + 1])
+
+    def count(self, frame_id, class_id):
+        """Number of detections of a (frame_id, class_id) pair."""
+        start, end = self.slice(frame_id, class_id)
+        return end - start
+
+    @classmethod
+    def from_columns(cls, columns, n_frame, n_class, ids=None):
+        """
+        Create a DetTable from txt columns (see read_txt_columns).
+        :param columns: dict of columns 'frame_id', 'class_id', 'range', 'angle', 'score'
+        :param n_frame: number of frames
+        :param n_class: number of classes
+        :param ids: object ids, numbered from 1 in frame order (stable) if not given
+        :return: DetTable
+        """
+        if ids is None:
+            ids = np.empty(len(columns['frame_id']), dtype=np.int32)
+            ids[np.argsort(columns['frame_id'], kind='mergesort')] = np.arange(1, len(ids) + 1)
+        columns = dict(columns, id=ids)
+        return cls(columns, n_frame, n_class)
@@ -1,6 +1,12 @@
 import os
+import json
+import pickle
+import hashlib
+import multiprocessing
 import numpy as np
 
+from cruw.io.files import atomic_write
+
 from .load_txt import read_gt_txt, read_sub_txt
 from .rod_eval_utils import compute_ols_dts_gts, evaluate_img, accumulate, summarize
 
@@ -8,7 +14,102 @@ olsThrs = np.around(np.linspace(0.5, 0.9, int(np.round((0.9 - 0.5) / 0.05) + 1),
 recThrs = np.around(np.linspace(0.0, 1.0, int(np.round((1.0 - 0.0) / 0.01) + 1), endpoint=True), decimals=2)
 
 
-def evaluate_rod2021(submit_dir, truth_dir, dataset):
+# bump when the cached evalImgs format or the evaluation logic changes
+CACHE_VERSION = 1
+
+_worker_dataset = {}
+
+
+def _init_worker(dataset):
+    # the dataset object is sent once per worker process instead of once per task
+    _worker_dataset['dataset'] = dataset
+
+
+def _evaluate_seq_worker(args):
+    gt_path, sub_path, n_frame, cache_dir = args
+    return evaluate_seq_cached(gt_path, sub_path, n_frame, _worker_dataset['dataset'], cache_dir)
+
+
+def get_seq_cache_key(gt_path, sub_path, n_frame, dataset):
+    """
+    Content hash of everything the evaluation result of a sequence depends on.
+    :return: hex digest
+    """
+    radar_cfg = dataset.sensor_cfg.radar_cfg
+    settings = dict(
+        version=CACHE_VERSION,
+        n_frame=n_frame,
+        object_cfg=dataset.object_cfg.serialize(),
+        roi=[radar_cfg['rr_min'], radar_cfg['rr_max'], radar_cfg['ra_min_label'], radar_cfg['ra_max_label']],
+        olsThrs=olsThrs.tolist(),
+        recThrs=recThrs.tolist(),
+    )
+    h = hashlib.sha1(json.dumps(settings, sort_keys=True).encode())
+    for path in (gt_path, sub_path):
+        with open(path, 'rb') as f:
+            h.update(hashlib.sha1(f.read()).digest())
+    return h.hexdigest()
+
+
+def evaluate_seq_cached(gt_path, sub_path, n_frame, dataset, cache_dir=None):
+    """
+    Evaluate one sequence, reusing the evalImgs in cache_dir if the files and settings are unchanged.
+    :param cache_dir: cache folder, no caching if None
+    :return: evalImgs of the sequence
+    """
+    if cache_dir is None:
+        return evaluate_seq(gt_path, sub_path, n_frame, dataset)
+
+    key = get_seq_cache_key(gt_path, sub_path, n_frame, dataset)
+    cache_path = os.path.join(cache_dir, '%s.pkl' % key)
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            # broken cache file, evaluate again and overwrite it
+            pass
+
+    evalImgs = evaluate_seq(gt_path, sub_path, n_frame, dataset)
+    os.makedirs(cache_dir, exist_ok=True)
+    # concurrent runs never read a partial file
+    with atomic_write(cache_path) as f:
+        pickle.dump(evalImgs, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return evalImgs
+
+
+def evaluate_seq(gt_path, sub_path, n_frame, dataset):
+    """
+    Evaluate one sequence of ROD2021 submission.
+    :param gt_path: ground truth txt path
+    :param sub_path: submission txt path
+    :param n_frame: number of frames in the sequence
+    :param dataset: CRUW dataset object
+    :return: evalImgs of the sequence
+    """
+    gt_dets = read_gt_txt(gt_path, n_frame, dataset)
+    sub_dets = read_sub_txt(sub_path, n_frame, dataset)
+
+    olss_all = {(imgId, catId): compute_ols_dts_gts(gt_dets, sub_dets, imgId, catId, dataset) \
+                for imgId in range(n_frame)
+                for catId in range(3)}
+
+    evalImgs = [evaluate_img(gt_dets, sub_dets, imgId, catId, olss_all, olsThrs, recThrs, dataset)
+                for imgId in range(n_frame)
+                for catId in range(3)]
+
+    return evalImgs
+
+
+def evaluate_rod2021(submit_dir, truth_dir, dataset, workers=0, cache_dir=None):
+    """
+    Evaluate ROD2021 submission.
+    :param submit_dir: folder of submission txt files
+    :param truth_dir: folder of ground truth txt files
+    :param dataset: CRUW dataset object
+    :param workers: number of worker processes evaluating sequences in parallel, 0 to evaluate serially
+    :param cache_dir: folder to cache per-sequence results, keyed by file contents and evaluation settings
+    """
     sub_names = sorted(os.listdir(submit_dir))
     gt_names = sorted(os.listdir(truth_dir))
     assert len(sub_names) == len(gt_names), "missing submission files!"
@@ -20,29 +121,26 @@ def evaluate_rod2021(submit_dir, truth_dir, dataset):
     evalImgs_all = []
     n_frames_all = 0
 
-    for seqid, (sub_name, gt_name) in enumerate(zip(sub_names, gt_names)):
+    tasks = []
+    for sub_name, gt_name in zip(sub_names, gt_names):
         gt_path = os.path.join(truth_dir, gt_name)
         sub_path = os.path.join(submit_dir, sub_name)
-        data_path = os.path.join(dataset.data_root, 'sequences', 'test', gt_names[seqid][:-4])
-        # n_frame = len(os.listdir(os.path.join(data_path, dataset.sensor_cfg.camera_cfg['image_folder'])))
-        n_frame = int(len(os.listdir(os.path.join(data_path, dataset.sensor_cfg.radar_cfg['chirp_folder']))) / len(
-            dataset.sensor_cfg.radar_cfg['chirp_ids']))
-
-        gt_dets = read_gt_txt(gt_path, n_frame, dataset)
-        sub_dets = read_sub_txt(sub_path, n_frame, dataset)
-
-        olss_all = {(imgId, catId): compute_ols_dts_gts(gt_dets, sub_dets, imgId, catId, dataset) \
-                    for imgId in range(n_frame)
-                    for catId in range(3)}
-
-        evalImgs = [evaluate_img(gt_dets, sub_dets, imgId, catId, olss_all, olsThrs, recThrs, dataset)
-                    for imgId in range(n_frame)
-                    for catId in range(3)]
-
+        n_frame = dataset.manifest.get_n_frames(gt_name[:-4])
+        tasks.append((gt_path, sub_path, n_frame, cache_dir))
         n_frames_all += n_frame
+
+    if workers > 0:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(dataset,)) as pool:
+            # map keeps the sequence order, so the results are identical to the serial evaluation
+            evalImgs_seqs = pool.map(_evaluate_seq_worker, tasks)
+    else:
+        evalImgs_seqs = [evaluate_seq_cached(gt_path, sub_path, n_frame, dataset, cache_dir)
+                         for gt_path, sub_path, n_frame, cache_dir in tasks]
+    for evalImgs in evalImgs_seqs:
         evalImgs_all.extend(evalImgs)
 
     eval = accumulate(evalImgs_all, n_frames_all, olsThrs, recThrs, dataset, log=False)
     stats = summarize(eval, olsThrs, recThrs, dataset, gl=False)
     print("AP_total: %.4f" % (stats[0] * 100))
     print("AR_total: %.4f" % (stats[1] * 100))
+    return stats
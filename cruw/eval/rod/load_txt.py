@@ -1,143 +1,111 @@
 import math
+import warnings
+import numpy as np
 
 from cruw.mapping.object_types import get_class_id
 
+from .det_table import DetTable
 
-def read_gt_txt(txt_path, n_frame, dataset):
-    n_class = dataset.object_cfg.n_class
+
+def get_roi_mask(rng, agl, radar_cfg):
+    """
+    Get the mask of objects inside the evaluation ROI.
+    :param rng: object ranges (m)
+    :param agl: object angles (rad)
+    :param radar_cfg: radar configurations with 'rr_min', 'rr_max', 'ra_min_label' and 'ra_max_label'
+    :return: boolean mask
+    """
+    return (rng >= radar_cfg['rr_min']) & (rng <= radar_cfg['rr_max']) & \
+           (agl >= math.radians(radar_cfg['ra_min_label'])) & (agl <= math.radians(radar_cfg['ra_max_label']))
+
+
+def read_txt_columns(txt_path, dataset, with_score=False, roi_filter=True):
+    """
+    Read a ROD2021 txt file into typed columns.
+    Each line is 'frame_id range angle class_name' for gt, with an extra 'score' column for submissions.
+    :param txt_path: txt file path
+    :param dataset: dataset object
+    :param with_score: whether the file has a score column
+    :param roi_filter: only keep objects inside the evaluation ROI
+    :return: dict of columns 'frame_id' int32, 'range' float32, 'angle' float32, 'class_id' int8, 'score' float32,
+             in file order
+    """
     classes = dataset.object_cfg.classes
-    with open(txt_path, 'r') as f:
-        data = f.readlines()
-    dets = [None] * n_frame
-    for line in data:
-        frame_id, r, a, class_name = line.rstrip().split()
-        frame_id = int(frame_id)
-        r = float(r)
-        a = float(a)
-        class_id = classes.index(class_name)
-        obj_dict = dict(
-            frame_id=frame_id,
-            range=r,
-            angle=a,
-            class_name=class_name,
-            class_id=class_id
-        )
-        if dets[frame_id] is None:
-            dets[frame_id] = [obj_dict]
-        else:
-            dets[frame_id].append(obj_dict)
-
-    gts = {(i, j): [] for i in range(n_frame) for j in range(n_class)}
-    id = 1
-    for frameid, obj_info in enumerate(dets):
-        # for each frame
-        if obj_info is None:
-            continue
-        for obj_dict in obj_info:
-            rng = obj_dict['range']
-            agl = obj_dict['angle']
-            class_id = obj_dict['class_id']
-            if rng > 25 or rng < 1:
-                continue
-            if agl > math.radians(60) or agl < math.radians(-60):
-                continue
-            obj_dict_gt = obj_dict.copy()
-            obj_dict_gt['id'] = id
-            obj_dict_gt['score'] = 1.0
-            gts[frameid, class_id].append(obj_dict_gt)
-            id += 1
-
-    return gts
+    names = ['frame_id', 'range', 'angle', 'class_name']
+    formats = ['i4', 'f8', 'f8', 'U32']
+    if with_score:
+        names.append('score')
+        formats.append('f4')
+    with warnings.catch_warnings():
+        # empty files are valid (no objects)
+        warnings.simplefilter('ignore', UserWarning)
+        data = np.loadtxt(txt_path, dtype={'names': names, 'formats': formats}, ndmin=1)
+
+    if roi_filter:
+        data = data[get_roi_mask(data['range'], data['angle'], dataset.sensor_cfg.radar_cfg)]
+
+    class_names, class_inds = np.unique(data['class_name'], return_inverse=True)
+    class_ids = np.array([classes.index(class_name) for class_name in class_names], dtype=np.int8)
+    columns = dict(
+        frame_id=data['frame_id'].astype(np.int32),
+        range=data['range'].astype(np.float32),
+        angle=data['angle'].astype(np.float32),
+        class_id=class_ids[class_inds.reshape(-1)],
+    )
+    if with_score:
+        columns['score'] = data['score'].astype(np.float32)
+    else:
+        columns['score'] = np.ones(len(data), dtype=np.float32)
+    # astype copies the fields, so the parsed text columns are released here
+    return columns
+
+
+def read_gt_txt(txt_path, n_frame, dataset):
+    """
+    Read ROD2021 ground truth txt file.
+    :return: DetTable of ground truths inside the evaluation ROI, with score 1.0
+    """
+    columns = read_txt_columns(txt_path, dataset, with_score=False)
+    return DetTable.from_columns(columns, n_frame, dataset.object_cfg.n_class)
 
 
 def read_sub_txt(txt_path, n_frame, dataset):
-    n_class = dataset.object_cfg.n_class
-    classes = dataset.object_cfg.classes
-    with open(txt_path, 'r') as f:
-        data = f.readlines()
-    dets = [None] * n_frame
-    for line in data:
-        frame_id, r, a, class_name, score = line.rstrip().split()
-        frame_id = int(frame_id)
-        r = float(r)
-        a = float(a)
-        class_id = classes.index(class_name)
-        score = float(score)
-        obj_dict = dict(
-            frame_id=frame_id,
-            range=r,
-            angle=a,
-            class_name=class_name,
-            class_id=class_id,
-            score=score
-        )
-        if dets[frame_id] is None:
-            dets[frame_id] = [obj_dict]
-        else:
-            dets[frame_id].append(obj_dict)
-
-    dts = {(i, j): [] for i in range(n_frame) for j in range(n_class)}
-    id = 1
-    for frameid, obj_info in enumerate(dets):
-        # for each frame
-        if obj_info is None:
-            continue
-        for obj_dict in obj_info:
-            rng = obj_dict['range']
-            agl = obj_dict['angle']
-            class_id = obj_dict['class_id']
-            if rng > 25 or rng < 1:
-                continue
-            if agl > math.radians(60) or agl < math.radians(-60):
-                continue
-            obj_dict_gt = obj_dict.copy()
-            obj_dict_gt['id'] = id
-            dts[frameid, class_id].append(obj_dict_gt)
-            id += 1
-
-    return dts
+    """
+    Read ROD2021 submission txt file.
+    :return: DetTable of detections inside the evaluation ROI
+    """
+    columns = read_txt_columns(txt_path, dataset, with_score=True)
+    return DetTable.from_columns(columns, n_frame, dataset.object_cfg.n_class)
 
 
 def read_rodnet_res(filename, n_frame, dataset):
-    n_class = dataset.object_cfg.n_class
+    """
+    Read RODNet results txt file, each line is 'frame_id class_name range_id angle_id score'.
+    Detections of unknown classes are skipped.
+    :return: DetTable of detections inside the evaluation ROI, None if the file is empty
+    """
     classes = dataset.object_cfg.classes
     rng_grid = dataset.range_grid
     agl_grid = dataset.angle_grid
 
-    with open(filename, 'r') as df:
-        data = df.readlines()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        dtype = {'names': ('frame_id', 'class_name', 'range_id', 'angle_id', 'score'),
+                 'formats': ('i4', 'U32', 'i4', 'i4', 'f4')}
+        data = np.loadtxt(filename, ndmin=1, dtype=dtype)
     if len(data) == 0:
         return None
 
-    dts = {(i, j): [] for i in range(n_frame) for j in range(n_class)}
-
-    for id, line in enumerate(data):
-        if line is not None:
-            line = line.rstrip().split()
-            frameid, class_str, ridx, aidx, conf = line
-            frameid = int(frameid)
-            classid = get_class_id(class_str, classes)
-            ridx = int(ridx)
-            aidx = int(aidx)
-            conf = float(conf)
-            if conf > 1:
-                conf = 1
-            rng = rng_grid[ridx]
-            agl = agl_grid[aidx]
-            if rng > 25 or rng < 1:
-                continue
-            if agl > math.radians(60) or agl < math.radians(-60):
-                continue
-            obj_dict = dict(
-                id=id + 1,
-                frame_id=frameid,
-                range=rng,
-                angle=agl,
-                range_id=ridx,
-                angle_id=aidx,
-                class_id=classid,
-                score=conf
-            )
-            dts[frameid, classid].append(obj_dict)
-
-    return dts
+    class_names, class_inds = np.unique(data['class_name'], return_inverse=True)
+    class_ids = np.array([get_class_id(class_name, classes) for class_name in class_names])[class_inds.reshape(-1)]
+    columns = dict(
+        frame_id=data['frame_id'],
+        range=rng_grid[data['range_id']],
+        angle=agl_grid[data['angle_id']],
+        class_id=class_ids,
+        score=np.minimum(data['score'], 1),
+    )
+    ids = np.arange(1, len(data) + 1)
+    mask = get_roi_mask(columns['range'], columns['angle'], dataset.sensor_cfg.radar_cfg) & (class_ids >= 0)
+    columns = {name: col[mask] for name, col in columns.items()}
+    return DetTable.from_columns(columns, n_frame, dataset.object_cfg.n_class, ids=ids[mask])
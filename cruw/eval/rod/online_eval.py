@@ -0,0 +1,162 @@
+import numpy as np
+
+from cruw.eval.metrics import get_class_kappas, get_ols_matrix
+
+from .load_txt import get_roi_mask
+from .rod_eval_utils import match_dts_gts, compute_pr_curve, summarize
+from .eval_rod2021 import olsThrs, recThrs
+
+
+class RODEvaluator:
+    """
+    Online ROD evaluator that accepts detections and ground truths frame by frame.
+    Matching is the same as evaluate_img. By default, the score and matches of every detection are kept,
+    and the results are the same as evaluate_rod2021.
+    With exact=False, only per-class true/false positive counts in score bins are kept, so memory does not
+    grow with the number of frames. The results are approximate: detections in the same bin, including
+    detections with equal scores (e.g. scores written with 4 decimals), become a single point of the PR
+    curve, while evaluate_rod2021 orders them by frame, so AP differs whenever scores tie.
+    """
+
+    def __init__(self, dataset, olsThrs=olsThrs, recThrs=recThrs, n_score_bins=10000, roi_filter=True, exact=True):
+        """
+        :param dataset: CRUW dataset object
+        :param olsThrs: OLS thresholds
+        :param recThrs: recall thresholds
+        :param n_score_bins: number of score bins in [0, 1] when exact is False
+        :param roi_filter: only evaluate objects inside the evaluation ROI
+        :param exact: keep the score and matches of every detection, otherwise binned counts (approximate AP)
+        """
+        self.dataset = dataset
+        self.olsThrs = olsThrs
+        self.recThrs = recThrs
+        self.n_score_bins = n_score_bins
+        self.roi_filter = roi_filter
+        self.exact = exact
+        self.n_class = dataset.object_cfg.n_class
+        self.kappas = get_class_kappas(dataset.object_cfg)
+        self.reset()
+
+    def reset(self):
+        T = len(self.olsThrs)
+        K = self.n_class
+        self.tp_counts = np.zeros((T, K, self.n_score_bins), dtype=np.int64)
+        self.fp_counts = np.zeros((T, K, self.n_score_bins), dtype=np.int64)
+        self.n_objects = np.zeros((K,), dtype=np.int64)
+        self.class_seen = np.zeros((K,), dtype=bool)
+        self.n_frames = 0
+        # exact mode: per class, lists of detection scores [D] and matches [T x D] of each frame
+        self.dt_scores = [[] for _ in range(K)]
+        self.dt_matches = [[] for _ in range(K)]
+
+    def update(self, dts, gts):
+        """
+        Add the detections and ground truths of one frame.
+        :param dts: detections [n_dts x 4]: range(m), angle(rad), class_id, score
+        :param gts: ground truths [n_gts x 3]: range(m), angle(rad), class_id
+        """
+        dts = np.asarray(dts, dtype=float).reshape(-1, 4)
+        gts = np.asarray(gts, dtype=float).reshape(-1, 3)
+        if self.roi_filter:
+            radar_cfg = self.dataset.sensor_cfg.radar_cfg
+            dts = dts[get_roi_mask(dts[:, 0], dts[:, 1], radar_cfg)]
+            gts = gts[get_roi_mask(gts[:, 0], gts[:, 1], radar_cfg)]
+        T = len(self.olsThrs)
+
+        for classid in range(self.n_class):
+            dts_class = dts[dts[:, 2] == classid]
+            gts_class = gts[gts[:, 2] == classid]
+            D = len(dts_class)
+            G = len(gts_class)
+            if D == 0 and G == 0:
+                continue
+            self.class_seen[classid] = True
+            self.n_objects[classid] += G
+            if D == 0:
+                continue
+
+            dts_class = dts_class[np.argsort(-dts_class[:, 3], kind='mergesort')]
+            if G > 0:
+                olss = get_ols_matrix(gts_class[:, 0], gts_class[:, 1], gts_class[:, 2],
+                                      dts_class[:, 0], dts_class[:, 1], dts_class[:, 2], self.kappas).T
+                dt_match_inds, _ = match_dts_gts(olss, self.olsThrs)
+                tps = dt_match_inds > -1
+            else:
+                tps = np.zeros((T, D), dtype=bool)
+
+            if self.exact:
+                self.dt_scores[classid].append(dts_class[:, 3])
+                self.dt_matches[classid].append(tps)
+                continue
+            bins = np.clip((dts_class[:, 3] * self.n_score_bins).astype(int), 0, self.n_score_bins - 1)
+            flat_bins = (np.arange(T)[:, None] * self.n_score_bins + bins[None, :]).ravel()
+            size = T * self.n_score_bins
+            self.tp_counts[:, classid] += np.bincount(flat_bins, weights=tps.ravel(),
+                                                      minlength=size).astype(np.int64).reshape(T, -1)
+            self.fp_counts[:, classid] += np.bincount(flat_bins, weights=~tps.ravel(),
+                                                      minlength=size).astype(np.int64).reshape(T, -1)
+
+        self.n_frames += 1
+
+    def accumulate(self):
+        """
+        Compute precision and recall from the statistics seen so far, in the same format as accumulate.
+        :return: eval dict
+        """
+        T = len(self.olsThrs)
+        R = len(self.recThrs)
+        K = self.n_class
+        precision = -np.ones((T, R, K))  # -1 for the precision of absent categories
+        recall = -np.ones((T, K))
+        scores = -np.ones((T, R, K))
+
+        # bin centers in descending score order
+        bin_scores = (np.arange(self.n_score_bins)[::-1] + 0.5) / self.n_score_bins
+        for classid in range(K):
+            if not self.class_seen[classid]:
+                continue
+            if self.exact:
+                precision[:, :, classid], recall[:, classid], scores[:, :, classid] = self._accumulate_exact(classid)
+                continue
+            tp = self.tp_counts[:, classid, ::-1]
+            fp = self.fp_counts[:, classid, ::-1]
+            # the number of detections in a bin does not depend on the threshold
+            nonempty = (tp[0] + fp[0]) > 0
+            tp_sum = np.cumsum(tp, axis=1)[:, nonempty].astype(float)
+            fp_sum = np.cumsum(fp, axis=1)[:, nonempty].astype(float)
+            precision[:, :, classid], recall[:, classid], scores[:, :, classid] = \
+                compute_pr_curve(tp_sum, fp_sum, self.n_objects[classid], bin_scores[nonempty], self.recThrs)
+
+        eval = {
+            'counts': [T, R, K],
+            'object_counts': self.n_objects.astype(float),
+            'precision': precision,
+            'recall': recall,
+            'scores': scores,
+        }
+        return eval
+
+    def _accumulate_exact(self, classid):
+        """Precision and recall of a class from the kept detections, same as accumulate."""
+        T = len(self.olsThrs)
+        if len(self.dt_scores[classid]) == 0:
+            return compute_pr_curve(np.zeros((T, 0)), np.zeros((T, 0)), self.n_objects[classid],
+                                    np.zeros((0,)), self.recThrs)
+        dt_scores = np.concatenate(self.dt_scores[classid])
+        # mergesort in frame order, the same as accumulate
+        inds = np.argsort(-dt_scores, kind='mergesort')
+        tps = np.concatenate(self.dt_matches[classid], axis=1)[:, inds]
+        tp_sum = np.cumsum(tps, axis=1).astype(float)
+        fp_sum = np.cumsum(~tps, axis=1).astype(float)
+        return compute_pr_curve(tp_sum, fp_sum, self.n_objects[classid], dt_scores[inds], self.recThrs)
+
+    def compute(self, gl=False):
+        """
+        Summarize the evaluation so far.
+        With exact=True (default), the results are the same as summarize in evaluate_rod2021.
+        With exact=False, they are approximate: tied scores, or scores sharing a bin, change AP.
+        :param gl: return AP/AR at all OLS thresholds, otherwise only AP_total and AR_total
+        :return: stats
+        """
+        eval = self.accumulate()
+        return summarize(eval, self.olsThrs, self.recThrs, self.dataset, gl=gl)
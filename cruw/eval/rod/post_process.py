@@ -0,0 +1,168 @@
+import numpy as np
+
+from cruw.eval.metrics import get_class_kappas, get_ols_matrix
+
+
+def detect_peaks(confmaps, peak_thres=0.3):
+    """
+    Find the local maxima (3 x 3 neighborhood) above a threshold in confidence maps.
+    :param confmaps: confidence maps [n_frames x n_class x r x a]
+    :param peak_thres: minimum peak value
+    :return: frame_ids, class_ids, range_ids, angle_ids, scores of the peaks [n_peaks]
+    """
+    confmaps = np.asarray(confmaps)
+    n_rng, n_agl = confmaps.shape[2:]
+    flat = confmaps.reshape(-1)
+    inds = np.flatnonzero(flat > peak_thres)
+    if len(inds) > flat.size // 8:
+        is_peak = _is_local_max_dense(confmaps).reshape(-1)[inds]
+    else:
+        # only the bins above the threshold are compared with their neighbors
+        range_ids = inds // n_agl % n_rng
+        angle_ids = inds % n_agl
+        is_peak = np.ones(len(inds), dtype=bool)
+        for dr in (-1, 0, 1):
+            for da in (-1, 0, 1):
+                if dr == 0 and da == 0:
+                    continue
+                inside = (range_ids + dr >= 0) & (range_ids + dr < n_rng) & \
+                         (angle_ids + da >= 0) & (angle_ids + da < n_agl)
+                is_peak &= flat[inds] >= flat[np.where(inside, inds + dr * n_agl + da, inds)]
+    # plateaus give several peaks, they are merged by NMS
+    inds = inds[is_peak]
+    frame_ids, class_ids, range_ids, angle_ids = np.unravel_index(inds, confmaps.shape)
+    return frame_ids, class_ids, range_ids, angle_ids, flat[inds].astype(np.float32)
+
+
+def _is_local_max_dense(confmaps):
+    """Local maxima mask of all bins, for maps with many bins above the threshold."""
+    n_rng, n_agl = confmaps.shape[2:]
+    padded = np.pad(confmaps, ((0, 0), (0, 0), (1, 1), (1, 1)), mode='constant', constant_values=-np.inf)
+    neighbor_max = np.full(confmaps.shape, -np.inf, dtype=confmaps.dtype)
+    for dr in range(3):
+        for da in range(3):
+            if dr == 1 and da == 1:
+                continue
+            np.maximum(neighbor_max, padded[:, :, dr:dr + n_rng, da:da + n_agl], out=neighbor_max)
+    return confmaps >= neighbor_max
+
+
+def ols_nms(frame_ids, rngs, agls, class_ids, scores, kappas, ols_thres=0.3, max_dets=20, class_agnostic=False):
+    """
+    Greedy non-maximum suppression with OLS, batched over frames.
+    In each frame, detections are visited in descending score order, and a detection is suppressed if its OLS
+    with a kept detection is larger than ols_thres, until max_dets detections are kept. OLS is the same as
+    get_ols_matrix, with the scale of the kept detection and kappa of the larger class id.
+    :param frame_ids: frame ids of detections [n]
+    :param rngs: ranges (m) of detections [n]
+    :param agls: angles (rad) of detections [n]
+    :param class_ids: class ids of detections [n]
+    :param scores: scores of detections [n]
+    :param kappas: kappa of each class from get_class_kappas
+    :param ols_thres: OLS threshold for suppression
+    :param max_dets: maximum number of detections kept in each frame
+    :param class_agnostic: suppress detections of other classes as well
+    :return: indices of the kept detections, sorted by frame and descending score
+    """
+    frame_ids = np.asarray(frame_ids)
+    if len(frame_ids) == 0:
+        return np.zeros((0,), dtype=np.int64)
+    order = np.lexsort((-np.asarray(scores), frame_ids))
+    _, starts, counts = np.unique(frame_ids[order], return_index=True, return_counts=True)
+    n_frames = len(starts)
+    n_slots = counts.max()
+
+    # pad the detections of each frame to [n_frames x n_slots]
+    rows = np.repeat(np.arange(n_frames), counts)
+    cols = np.arange(len(order)) - np.repeat(starts, counts)
+    index = np.full((n_frames, n_slots), -1, dtype=np.int64)
+    index[rows, cols] = order
+    valid = index >= 0
+    rng = np.ones((n_frames, n_slots))
+    agl = np.zeros((n_frames, n_slots))
+    cls = np.zeros((n_frames, n_slots), dtype=int)
+    rng[rows, cols] = np.asarray(rngs)[order]
+    agl[rows, cols] = np.asarray(agls)[order]
+    cls[rows, cols] = np.asarray(class_ids)[order]
+
+    # only kept detections suppress others, so each candidate is compared with at most max_dets detections
+    kept_rng = np.ones((n_frames, max_dets))
+    kept_agl = np.zeros((n_frames, max_dets))
+    kept_cls = np.zeros((n_frames, max_dets), dtype=int)
+    n_kept = np.zeros((n_frames,), dtype=np.int64)
+    keep = np.zeros((n_frames, n_slots), dtype=bool)
+    frame_inds = np.arange(n_frames)
+    for slot in range(n_slots):
+        active = valid[:, slot] & (n_kept < max_dets)
+        if not active.any():
+            if (n_kept >= max_dets).all():
+                break
+            continue
+        olss = get_ols_matrix(kept_rng, kept_agl, kept_cls, rng[:, slot:slot + 1], agl[:, slot:slot + 1],
+                              cls[:, slot:slot + 1], kappas)[:, :, 0]
+        overlap = (olss > ols_thres) & (np.arange(max_dets)[None, :] < n_kept[:, None])
+        if not class_agnostic:
+            overlap &= kept_cls == cls[:, slot:slot + 1]
+        new = active & ~overlap.any(axis=1)
+        keep[:, slot] = new
+        rows_new = frame_inds[new]
+        kept_rng[rows_new, n_kept[new]] = rng[new, slot]
+        kept_agl[rows_new, n_kept[new]] = agl[new, slot]
+        kept_cls[rows_new, n_kept[new]] = cls[new, slot]
+        n_kept += new
+    return index[keep]
+
+
+def post_process_confmaps(confmaps, dataset, peak_thres=0.3, ols_thres=0.3, max_dets=20, class_agnostic=False,
+                          range_grid=None, angle_grid=None, chunk_size=256):
+    """
+    Get detections from confidence maps with peak detection and OLS-NMS.
+    :param confmaps: confidence maps [n_frames x n_class x r x a], e.g. memory-mapped model outputs
+    :param dataset: dataset object
+    :param peak_thres: minimum peak value
+    :param ols_thres: OLS threshold for suppression
+    :param max_dets: maximum number of detections in each frame
+    :param class_agnostic: suppress overlapping detections of other classes as well
+    :param range_grid: range grid of the maps, dataset.range_grid by default
+    :param angle_grid: angle grid of the maps, dataset.angle_grid by default
+    :param chunk_size: number of frames processed at once
+    :return: dict of columns 'frame_id', 'class_id', 'range_id', 'angle_id', 'range', 'angle', 'score',
+             sorted by frame and descending score
+    """
+    if range_grid is None:
+        range_grid = dataset.range_grid
+    if angle_grid is None:
+        angle_grid = dataset.angle_grid
+    range_grid = np.asarray(range_grid)
+    angle_grid = np.asarray(angle_grid)
+    kappas = get_class_kappas(dataset.object_cfg)
+
+    names = ['frame_id', 'class_id', 'range_id', 'angle_id', 'range', 'angle', 'score']
+    dtypes = [np.int32, np.int8, np.int32, np.int32, np.float32, np.float32, np.float32]
+    chunks = []
+    for start in range(0, confmaps.shape[0], chunk_size):
+        frame_ids, class_ids, range_ids, angle_ids, scores = detect_peaks(confmaps[start:start + chunk_size],
+                                                                          peak_thres)
+        rngs = range_grid[range_ids]
+        agls = angle_grid[angle_ids]
+        keep = ols_nms(frame_ids, rngs, agls, class_ids, scores, kappas, ols_thres=ols_thres, max_dets=max_dets,
+                       class_agnostic=class_agnostic)
+        columns = [frame_ids + start, class_ids, range_ids, angle_ids, rngs, agls, scores]
+        chunks.append([column[keep].astype(dtype) for column, dtype in zip(columns, dtypes)])
+    return dict((name, np.concatenate([chunk[i] for chunk in chunks] + [np.zeros((0,), dtype=dtype)]))
+                for i, (name, dtype) in enumerate(zip(names, dtypes)))
+
+
+def write_rodnet_res(res_path, dets, dataset):
+    """
+    Write detections in RODNet results format, each line is 'frame_id class_name range_id angle_id score'
+    (see read_rodnet_res).
+    :param res_path: output txt file path
+    :param dets: detection columns from post_process_confmaps
+    :param dataset: dataset object
+    """
+    classes = dataset.object_cfg.classes
+    with open(res_path, 'w') as f:
+        for frame_id, class_id, range_id, angle_id, score in zip(dets['frame_id'], dets['class_id'], dets['range_id'],
+                                                                 dets['angle_id'], dets['score']):
+            f.write("%d %s %d %d %.4f\n" % (frame_id, classes[class_id], range_id, angle_id, score))
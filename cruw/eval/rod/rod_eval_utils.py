@@ -1,79 +1,129 @@
 import numpy as np
 
-from cruw.eval.metrics import get_ols_btw_objects
-
-
-def compute_ols_dts_gts(gts_dict, dts_dict, imgId, catId, dataset):
-    """Compute OLS between detections and gts for a category in a frame."""
-    gts = gts_dict[imgId, catId]
-    dts = dts_dict[imgId, catId]
-    inds = np.argsort([-d['score'] for d in dts], kind='mergesort')
-    dts = [dts[i] for i in inds]
-    if len(gts) == 0 or len(dts) == 0:
+from cruw.eval.metrics import get_class_kappas, get_ols_matrix
+
+
+def compute_ols_dts_gts(gts_table, dts_table, imgId, catId, dataset):
+    """
+    Compute OLS between detections and gts for a category in a frame.
+    :param gts_table: DetTable of ground truths
+    :param dts_table: DetTable of detections, sorted by descending score in each frame and category
+    :return: OLS matrix [D x G], [] if there are no detections or no gts
+    """
+    gts = gts_table[imgId, catId]
+    dts = dts_table[imgId, catId]
+    if len(gts['id']) == 0 or len(dts['id']) == 0:
         return []
-    olss = np.zeros((len(dts), len(gts)))
-    # compute oks between each detection and ground truth object
-    for j, gt in enumerate(gts):
-        for i, dt in enumerate(dts):
-            olss[i, j] = get_ols_btw_objects(gt, dt, dataset)
-    return olss
-
-
-def evaluate_img(gts_dict, dts_dict, imgId, catId, olss_dict, olsThrs, recThrs, dataset, log=False):
+    kappas = get_class_kappas(dataset.object_cfg)
+    # compute ols between each ground truth object and detection, scaled by the ground truth range
+    olss = get_ols_matrix(gts['range'], gts['angle'], gts['class_id'],
+                          dts['range'], dts['angle'], dts['class_id'], kappas)
+    return olss.T
+
+
+def match_dts_gts(olss, olsThrs):
+    """
+    Greedy matching between detections and gts for all OLS thresholds at once.
+    Each detection (in descending score order) is matched to the unmatched gt with the highest OLS
+    above the threshold; ties go to the later gt.
+    :param olss: OLS matrix [D x G]
+    :param olsThrs: OLS thresholds [T]
+    :return: dt_match_inds [T x D] matched gt index, gt_match_inds [T x G] matched dt index, -1 if unmatched
+    """
+    D, G = olss.shape
+    T = len(olsThrs)
+    dt_match_inds = -np.ones((T, D), dtype=int)
+    gt_match_inds = -np.ones((T, G), dtype=int)
+    thrs = np.minimum(olsThrs, 1 - 1e-10)[:, None]
+    tinds = np.arange(T)
+    for dind in range(D):
+        valid = (gt_match_inds == -1) & (olss[dind][None, :] >= thrs)
+        cand = np.where(valid, olss[dind][None, :], -np.inf)
+        # index of the last maximum along gts
+        m = G - 1 - np.argmax(cand[:, ::-1], axis=1)
+        matched = valid[tinds, m]
+        dt_match_inds[matched, dind] = m[matched]
+        gt_match_inds[tinds[matched], m[matched]] = dind
+    return dt_match_inds, gt_match_inds
+
+
+def evaluate_img(gts_table, dts_table, imgId, catId, olss_dict, olsThrs, recThrs, dataset, log=False):
+    """
+    Match detections and gts for a category in a frame.
+    :param gts_table: DetTable of ground truths
+    :param dts_table: DetTable of detections, sorted by descending score in each frame and category
+    """
     classes = dataset.object_cfg.classes
 
-    gts = gts_dict[imgId, catId]
-    dts = dts_dict[imgId, catId]
-    if len(gts) == 0 and len(dts) == 0:
+    gts = gts_table[imgId, catId]
+    dts = dts_table[imgId, catId]
+    if len(gts['id']) == 0 and len(dts['id']) == 0:
         return None
 
     if log:
         olss_flatten = np.ravel(olss_dict[imgId, catId])
         print("Frame %d: %10s %s" % (imgId, classes[catId], list(olss_flatten)))
 
-    dtind = np.argsort([-d['score'] for d in dts], kind='mergesort')
-    dts = [dts[i] for i in dtind]
     olss = olss_dict[imgId, catId]
 
     T = len(olsThrs)
-    G = len(gts)
-    D = len(dts)
+    G = len(gts['id'])
+    D = len(dts['id'])
     gtm = np.zeros((T, G))
     dtm = np.zeros((T, D))
 
     if not len(olss) == 0:
-        for tind, t in enumerate(olsThrs):
-            for dind, d in enumerate(dts):
-                # information about best match so far (m=-1 -> unmatched)
-                iou = min([t, 1 - 1e-10])
-                m = -1
-                for gind, g in enumerate(gts):
-                    # if this gt already matched, continue
-                    if gtm[tind, gind] > 0:
-                        continue
-                    if olss[dind, gind] < iou:
-                        continue
-                    # if match successful and best so far, store appropriately
-                    iou = olss[dind, gind]
-                    m = gind
-                # if match made store id of match for both dt and gt
-                if m == -1:
-                    # no gt matched
-                    continue
-                dtm[tind, dind] = gts[m]['id']
-                gtm[tind, m] = d['id']
+        dt_match_inds, gt_match_inds = match_dts_gts(olss, olsThrs)
+        dtm[dt_match_inds > -1] = gts['id'][dt_match_inds[dt_match_inds > -1]]
+        gtm[gt_match_inds > -1] = dts['id'][gt_match_inds[gt_match_inds > -1]]
     # store results for given image and category
     return {
         'image_id': imgId,
         'category_id': catId,
-        'dtIds': [d['id'] for d in dts],
-        'gtIds': [g['id'] for g in gts],
+        'dtIds': dts['id'],
+        'gtIds': gts['id'],
         'dtMatches': dtm,
         'gtMatches': gtm,
-        'dtScores': [d['score'] for d in dts],
+        'dtScores': dts['score'],
     }
 
 
+def compute_pr_curve(tp_sum, fp_sum, ng, dtScoresSorted, recThrs):
+    """
+    Compute precision sampled at recall thresholds and the final recall.
+    :param tp_sum: cumulative true positives along detections in descending score order [T x nd]
+    :param fp_sum: cumulative false positives along detections in descending score order [T x nd]
+    :param ng: number of ground truths
+    :param dtScoresSorted: detection scores in descending order [nd]
+    :param recThrs: recall thresholds [R]
+    :return: precision [T x R], recall [T], scores [T x R]
+    """
+    T, nd = tp_sum.shape
+    R = len(recThrs)
+    if nd == 0:
+        return np.zeros((T, R)), np.zeros((T,)), np.zeros((T, R))
+
+    rc = tp_sum / (ng + np.spacing(1))
+    pr = tp_sum / (fp_sum + tp_sum + np.spacing(1))
+    recall = rc[:, -1]
+
+    # precision envelope: the max precision at this or any higher recall (reverse cumulative max)
+    pr = np.maximum.accumulate(pr[:, ::-1], axis=1)[:, ::-1]
+
+    # first detection reaching each recall threshold, nd if the threshold is never reached.
+    # recalls are nondecreasing, so it is the number of recalls below the threshold: all recalls are
+    # bucketed by the thresholds in one search, and the buckets are counted per row
+    buckets = np.searchsorted(recThrs, rc, side='right') + np.arange(T)[:, None] * (R + 1)
+    inds = np.cumsum(np.bincount(buckets.ravel(), minlength=T * (R + 1)).reshape(T, R + 1), axis=1)[:, :R]
+    # recall thresholds that are never reached get precision and score 0
+    reached = inds < nd
+    inds = np.minimum(inds, nd - 1)
+    precision = np.where(reached, np.take_along_axis(pr, inds, axis=1), 0)
+    scores = np.where(reached, np.asarray(dtScoresSorted)[inds], 0)
+
+    return precision, recall, scores
+
+
 def accumulate(evalImgs, n_frame, olsThrs, recThrs, dataset, log=True):
     n_class = dataset.object_cfg.n_class
     classes = dataset.object_cfg.classes
@@ -109,40 +159,11 @@ def accumulate(evalImgs, n_frame, olsThrs, recThrs, dataset, log=True):
 
         tps = np.array(dtm, dtype=bool)
         fps = np.logical_not(dtm)
-        tp_sum = np.cumsum(tps, axis=1).astype(dtype=np.float)
-        fp_sum = np.cumsum(fps, axis=1).astype(dtype=np.float)
-
-        for t, (tp, fp) in enumerate(zip(tp_sum, fp_sum)):
-            tp = np.array(tp)
-            fp = np.array(fp)
-            rc = tp / (ng + np.spacing(1))
-            pr = tp / (fp + tp + np.spacing(1))
-            q = np.zeros((R,))
-            ss = np.zeros((R,))
-
-            if nd:
-                recall[t, classid] = rc[-1]
-            else:
-                recall[t, classid] = 0
-
-            # numpy is slow without cython optimization for accessing elements
-            # use python array gets significant speed improvement
-            pr = pr.tolist()
-            q = q.tolist()
-
-            for i in range(nd - 1, 0, -1):
-                if pr[i] > pr[i - 1]:
-                    pr[i - 1] = pr[i]
-
-            inds = np.searchsorted(rc, recThrs, side='left')
-            try:
-                for ri, pi in enumerate(inds):
-                    q[ri] = pr[pi]
-                    ss[ri] = dtScoresSorted[pi]
-            except:
-                pass
-            precision[t, :, classid] = np.array(q)
-            scores[t, :, classid] = np.array(ss)
+        tp_sum = np.cumsum(tps, axis=1).astype(dtype=float)
+        fp_sum = np.cumsum(fps, axis=1).astype(dtype=float)
+
+        precision[:, :, classid], recall[:, classid], scores[:, :, classid] = \
+            compute_pr_curve(tp_sum, fp_sum, ng, dtScoresSorted, recThrs)
 
     eval = {
         'counts': [T, R, K],
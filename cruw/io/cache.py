@@ -0,0 +1,125 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from cruw.io.radar import load_chirp
+from cruw.io.image import load_image
+
+DEFAULT_CACHE_BYTES = 512 * 1024 ** 2
+
+
+class FrameCache:
+    """
+    Thread-safe LRU cache of decoded frames under a byte budget.
+    Keys are (seq_path, folder_name, frame_id, chirp_id) with the absolute sequence path,
+    e.g. ('/data/ROD2021/sequences/train/2019_04_09_BMS1000', 'RADAR_RA_H', 10, 64),
+    with chirp_id None for camera images. Cached arrays are read-only since they are shared by all callers.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        """Get a cached array, None if missing."""
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Cache an array and evict the least recently used ones beyond the byte budget."""
+        value = np.array(value)
+        value.setflags(write=False)
+        if value.nbytes > self.max_bytes:
+            return value
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.n_bytes -= old.nbytes
+            self._items[key] = value
+            self.n_bytes += value.nbytes
+            self._evict()
+        return value
+
+    def get_or_load(self, key, load_fn):
+        """Get a cached array, or load it with load_fn() and cache it."""
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, load_fn())
+        return value
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.n_bytes = 0
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions,
+                    n_items=len(self._items), n_bytes=self.n_bytes, max_bytes=self.max_bytes)
+
+    def _evict(self):
+        while self.n_bytes > self.max_bytes and self._items:
+            _, value = self._items.popitem(last=False)
+            self.n_bytes -= value.nbytes
+            self.evictions += 1
+
+
+_frame_cache = FrameCache()
+
+
+def get_frame_cache() -> FrameCache:
+    """The process-wide frame cache shared by CRUW loaders and visualization helpers."""
+    return _frame_cache
+
+
+def get_path_key(path):
+    """
+    Cache key of a dataset file: '<seq_path>/<folder>/<frame>[_<chirp>].<ext>' -> (seq_path, folder, frame, chirp),
+    where seq_path is absolute, so that datasets with the same sequence names do not share entries.
+    Files not following this layout are keyed by their absolute path.
+    """
+    path = os.path.abspath(path)
+    folder_path, file_name = os.path.split(path)
+    seq_path, folder_name = os.path.split(folder_path)
+    parts = file_name.split('.')[0].split('_')
+    try:
+        frame_id = int(parts[0])
+        chirp_id = int(parts[1]) if len(parts) == 2 else None
+    except ValueError:
+        return (path,)
+    if len(parts) > 2:
+        return (path,)
+    return seq_path, folder_name, frame_id, chirp_id
+
+
+def load_chirp_cached(chirp_path):
+    """Load a radar chirp .npy file through the frame cache."""
+    return get_frame_cache().get_or_load(get_path_key(chirp_path), lambda: load_chirp(chirp_path))
+
+
+def load_image_cached(image_path):
+    """Load and decode a camera image through the frame cache."""
+    return get_frame_cache().get_or_load(get_path_key(image_path), lambda: load_image(image_path))
@@ -0,0 +1,129 @@
+import os
+import threading
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from cruw.io.files import atomic_write
+from cruw.utils.parse_cam_calib import parse_cam_matrices
+
+CALIB_KEYS = ('camera_matrix', 'distortion_coefficients', 'rectification_matrix', 'projection_matrix')
+
+_calib_files = {}
+_calib_files_lock = threading.Lock()
+
+
+def get_calib_cache_path(calib_yaml_path):
+    """Binary cache of a calibration file, e.g. 'calib/2019_05_09/cam_0.yaml' -> 'calib/2019_05_09/cam_0.yaml.npz'."""
+    return calib_yaml_path + '.npz'
+
+
+def _read_calib_cache(cache_path, yaml_mtime):
+    try:
+        with np.load(cache_path) as data:
+            if int(data['yaml_mtime']) != yaml_mtime:
+                return None
+            return {key: data[key] for key in CALIB_KEYS}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_calib_cache(cache_path, calib, yaml_mtime):
+    try:
+        with atomic_write(cache_path) as f:
+            np.savez(f, yaml_mtime=np.int64(yaml_mtime), **calib)
+    except OSError:
+        print('warning: cannot write calibration cache to %s' % cache_path)
+
+
+def load_cam_calib_file(calib_yaml_path, binary_cache=False):
+    """
+    Load the matrices of a camera calibration YAML file.
+    Files are keyed by their resolved path and mtime, so each file is parsed once per process
+    and the result is shared by all callers (treat it as read-only).
+    :param calib_yaml_path: calibration YAML file path
+    :param binary_cache: read and write a '.npz' copy next to the YAML file to skip YAML parsing,
+                         off by default since the dataset folder may be read-only or shared
+    :return: dict of camera_matrix, distortion_coefficients, rectification_matrix, projection_matrix
+    """
+    real_path = os.path.realpath(calib_yaml_path)
+    yaml_mtime = os.stat(real_path).st_mtime_ns
+    key = (real_path, yaml_mtime)
+    with _calib_files_lock:
+        calib = _calib_files.get(key)
+    if calib is not None:
+        return calib
+
+    cache_path = get_calib_cache_path(real_path)
+    calib = _read_calib_cache(cache_path, yaml_mtime) if binary_cache else None
+    if calib is None:
+        # PyYAML is slow to import, only load it when a file is actually parsed
+        import yaml
+        with open(real_path, "r") as stream:
+            data = yaml.safe_load(stream)
+        calib = dict(zip(CALIB_KEYS, parse_cam_matrices(data)))
+        if binary_cache:
+            _write_calib_cache(cache_path, calib, yaml_mtime)
+    with _calib_files_lock:
+        return _calib_files.setdefault(key, calib)
+
+
+class CamCalibs(MutableMapping):
+    """
+    Camera calibrations by date: {date: {'cam_0': {...}, 'cam_1': {...}}, 'load_success': bool}.
+    Only the existence of the files is checked on creation, the calibrations of a date are
+    loaded on its first access. Dates sharing a file share the loaded matrices.
+    """
+
+    def __init__(self, data_root, calib_yaml_paths, binary_cache=False):
+        """
+        :param data_root: dataset root folder
+        :param calib_yaml_paths: {date: [cam_0 yaml path, (cam_1 yaml path)]} relative to data_root
+        :param binary_cache: use binary caches of the YAML files, see load_cam_calib_file
+        """
+        self.binary_cache = binary_cache
+        self._paths = {}
+        for date, paths in calib_yaml_paths.items():
+            paths = paths[:2] if len(paths) == 2 else paths[:1]
+            self._paths[date] = [os.path.join(data_root, path) for path in paths]
+        self._items = dict(load_success=all(os.path.exists(path)
+                                            for paths in self._paths.values() for path in paths))
+
+    def __getitem__(self, key):
+        if key not in self._items:
+            if key not in self._paths:
+                raise KeyError(key)
+            self._items[key] = self._load_date(key)
+        return self._items[key]
+
+    def __contains__(self, key):
+        # do not load the calibrations of a date to check it
+        return key in self._items or key in self._paths
+
+    def __setitem__(self, key, value):
+        self._items[key] = value
+
+    def __delitem__(self, key):
+        if key not in self._items and key not in self._paths:
+            raise KeyError(key)
+        self._items.pop(key, None)
+        self._paths.pop(key, None)
+
+    def __iter__(self):
+        yield from self._items
+        for date in self._paths:
+            if date not in self._items:
+                yield date
+
+    def __len__(self):
+        return len(self._items) + sum(1 for date in self._paths if date not in self._items)
+
+    def __repr__(self):
+        return 'CamCalibs(%s)' % list(self)
+
+    def _load_date(self, date):
+        calibs = {}
+        for cam_id, path in enumerate(self._paths[date]):
+            if os.path.exists(path):
+                calibs['cam_%d' % cam_id] = load_cam_calib_file(path, binary_cache=self.binary_cache)
+        return calibs
@@ -0,0 +1,49 @@
+import os
+import threading
+from contextlib import contextmanager
+
+
+def scandir_names(path, ext):
+    """
+    List the file names with extension ext and the mtime of a folder with a single scandir pass.
+    Hidden files (e.g. '._000000.jpg' written by macOS) are skipped.
+    """
+    suffix = '.' + ext
+    with os.scandir(path) as it:
+        names = sorted(entry.name for entry in it
+                       if entry.is_file() and entry.name.endswith(suffix) and not entry.name.startswith('.'))
+    return names, os.stat(path).st_mtime_ns
+
+
+def get_frame_name(file_name):
+    """'000123_0064.npy' -> '000123'"""
+    return file_name.split('.')[0].split('_')[0]
+
+
+def list_frame_ids(path, ext='npy'):
+    """
+    Sorted frame ids of the files in a folder, e.g. the chirp files '000123_0064.npy' of a radar folder.
+    Files with other extensions, hidden files and files not named by frame id are skipped.
+    """
+    names, _ = scandir_names(path, ext)
+    frame_names = set(get_frame_name(name) for name in names)
+    return sorted(int(frame_name) for frame_name in frame_names if frame_name.isdigit())
+
+
+@contextmanager
+def atomic_write(path, mode='wb'):
+    """
+    Open a temp file next to path for writing, and move it to path once it is written completely,
+    so that concurrent readers never see a partial file. The temp file is removed if writing fails.
+    :param path: output file path
+    :param mode: 'wb' or 'w'
+    """
+    tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,9 @@
+def load_image(image_path):
+    """
+    Load and decode a camera image.
+    :param image_path: image file path
+    :return: image [h x w x 3]
+    """
+    # matplotlib is only needed when images are actually loaded
+    import matplotlib.image
+    return matplotlib.image.imread(image_path)
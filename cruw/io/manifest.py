@@ -0,0 +1,195 @@
+import os
+import json
+
+from cruw.io.files import scandir_names, get_frame_name, atomic_write
+from cruw.io.packed import get_packed_path, PackedSequence
+
+MANIFEST_VERSION = 3
+
+
+def get_manifest_path(data_root):
+    """Manifest file is stored next to data_root, e.g. '/data/ROD2021' -> '/data/ROD2021.manifest.json'."""
+    return os.path.normpath(os.path.abspath(data_root)) + '.manifest.json'
+
+
+def _get_camera_ext(camera_cfg):
+    return camera_cfg['ext'] if camera_cfg else None
+
+
+class DatasetManifest:
+    """
+    Persistent index of the sequences in a CRUW dataset folder:
+    splits, sequences, number of frames, radar chirp file names and image file names.
+    It is validated by the mtimes of the scanned folders, and rebuilt when any of them changes.
+    """
+
+    def __init__(self, data_root, content):
+        self.data_root = data_root
+        self.content = content
+        self.sequences = content['sequences']
+        self._image_names = {}
+
+    @classmethod
+    def build(cls, data_root, sensor_cfg):
+        """
+        Scan 'sequences/<split>/<seq>' folders under data_root.
+        :param data_root: dataset root folder
+        :param sensor_cfg: SensorConfig
+        :return: DatasetManifest
+        """
+        chirp_folder = sensor_cfg.radar_cfg['chirp_folder']
+        chirp_ext = sensor_cfg.radar_cfg['ext']
+        image_folder = sensor_cfg.camera_cfg['image_folder'] if sensor_cfg.camera_cfg else None
+        image_ext = _get_camera_ext(sensor_cfg.camera_cfg)
+        mtimes = {}
+        splits = {}
+        sequences = {}
+
+        seqs_root = os.path.join(data_root, 'sequences')
+        if os.path.isdir(seqs_root):
+            mtimes['sequences'] = os.stat(seqs_root).st_mtime_ns
+            for split in sorted(os.listdir(seqs_root)):
+                split_dir = os.path.join(seqs_root, split)
+                if not os.path.isdir(split_dir):
+                    continue
+                mtimes[os.path.join('sequences', split)] = os.stat(split_dir).st_mtime_ns
+                splits[split] = []
+                for seq in sorted(os.listdir(split_dir)):
+                    seq_rel = os.path.join('sequences', split, seq)
+                    if not os.path.isdir(os.path.join(data_root, seq_rel)):
+                        continue
+                    radar_files, image_files = [], []
+                    mtimes[seq_rel] = os.stat(os.path.join(data_root, seq_rel)).st_mtime_ns
+                    chirp_rel = os.path.join(seq_rel, chirp_folder)
+                    if os.path.isdir(os.path.join(data_root, chirp_rel)):
+                        radar_files, mtimes[chirp_rel] = scandir_names(os.path.join(data_root, chirp_rel),
+                                                                        chirp_ext)
+                    if image_folder is not None:
+                        image_rel = os.path.join(seq_rel, image_folder)
+                        if os.path.isdir(os.path.join(data_root, image_rel)):
+                            image_files, mtimes[image_rel] = scandir_names(os.path.join(data_root, image_rel),
+                                                                            image_ext)
+                    n_frames = len(set(get_frame_name(name) for name in radar_files
+                                       if get_frame_name(name).isdigit()))
+                    pack_path = get_packed_path(os.path.join(data_root, seq_rel), chirp_folder)
+                    packed = os.path.isfile(pack_path)
+                    if packed and n_frames == 0:
+                        # only the packed file is kept
+                        n_frames = PackedSequence(pack_path).n_frames
+                    splits[split].append(seq)
+                    sequences[seq] = dict(
+                        split=split,
+                        n_frames=n_frames,
+                        packed=packed,
+                        radar_files=radar_files,
+                        image_files=image_files,
+                    )
+
+        content = dict(
+            version=MANIFEST_VERSION,
+            chirp_folder=chirp_folder,
+            chirp_ext=chirp_ext,
+            image_folder=image_folder,
+            image_ext=image_ext,
+            mtimes=mtimes,
+            splits=splits,
+            sequences=sequences,
+        )
+        return cls(data_root, content)
+
+    @classmethod
+    def load(cls, data_root, sensor_cfg, manifest_path=None):
+        """
+        Load the manifest of data_root, and build (and save) it if it is missing or outdated.
+        :param data_root: dataset root folder
+        :param sensor_cfg: SensorConfig
+        :param manifest_path: manifest file path, next to data_root by default
+        :return: DatasetManifest
+        """
+        if manifest_path is None:
+            manifest_path = get_manifest_path(data_root)
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r') as f:
+                    manifest = cls(data_root, json.load(f))
+                if manifest.is_valid(sensor_cfg):
+                    return manifest
+            except (OSError, ValueError, KeyError):
+                pass
+        manifest = cls.build(data_root, sensor_cfg)
+        manifest.save(manifest_path)
+        return manifest
+
+    def save(self, manifest_path):
+        """Save the manifest, skipped if the location is not writable."""
+        try:
+            with atomic_write(manifest_path, 'w') as f:
+                json.dump(self.content, f)
+        except OSError:
+            print('warning: cannot write dataset manifest to %s' % manifest_path)
+
+    def is_valid(self, sensor_cfg):
+        """Check the manifest version, folder names and the mtimes of all scanned folders."""
+        if self.content.get('version') != MANIFEST_VERSION:
+            return False
+        if self.content['chirp_folder'] != sensor_cfg.radar_cfg['chirp_folder'] or \
+                self.content['chirp_ext'] != sensor_cfg.radar_cfg['ext']:
+            return False
+        image_folder = sensor_cfg.camera_cfg['image_folder'] if sensor_cfg.camera_cfg else None
+        if self.content['image_folder'] != image_folder or \
+                self.content['image_ext'] != _get_camera_ext(sensor_cfg.camera_cfg):
+            return False
+        if 'sequences' not in self.content['mtimes'] and os.path.isdir(os.path.join(self.data_root, 'sequences')):
+            return False
+        for rel_path, mtime in self.content['mtimes'].items():
+            try:
+                if os.stat(os.path.join(self.data_root, rel_path)).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    @property
+    def splits(self):
+        """{split: [seq_name, ...]}"""
+        return self.content['splits']
+
+    def get_split(self, seq_name):
+        return self.sequences[seq_name]['split']
+
+    def get_n_frames(self, seq_name):
+        return self.sequences[seq_name]['n_frames']
+
+    def is_packed(self, seq_name):
+        return self.sequences[seq_name]['packed']
+
+    def get_radar_files(self, seq_name):
+        return self.sequences[seq_name]['radar_files']
+
+    def get_image_files(self, seq_name):
+        return self.sequences[seq_name]['image_files']
+
+    def get_seq_path(self, seq_name):
+        return os.path.join(self.data_root, 'sequences', self.get_split(seq_name), seq_name)
+
+    def get_chirp_path(self, seq_name, frame_id, chirp_id):
+        return os.path.join(self.get_seq_path(seq_name), self.content['chirp_folder'],
+                            '%06d_%04d.%s' % (frame_id, chirp_id, self.content['chirp_ext']))
+
+    def get_packed_path(self, seq_name):
+        return get_packed_path(self.get_seq_path(seq_name), self.content['chirp_folder'])
+
+    def get_image_name(self, seq_name, frame_id):
+        """Image file name of a frame, matched by the frame id in the file name (e.g. '0000000123.jpg')."""
+        if seq_name not in self._image_names:
+            self._image_names[seq_name] = dict((int(get_frame_name(name)), name)
+                                               for name in self.get_image_files(seq_name)
+                                               if get_frame_name(name).isdigit())
+        try:
+            return self._image_names[seq_name][int(frame_id)]
+        except KeyError:
+            raise KeyError("no image of frame %d in sequence %s" % (frame_id, seq_name))
+
+    def get_image_path(self, seq_name, frame_id):
+        return os.path.join(self.get_seq_path(seq_name), self.content['image_folder'],
+                            self.get_image_name(seq_name, frame_id))
@@ -0,0 +1,118 @@
+import os
+import json
+import struct
+import numpy as np
+
+from cruw.io.radar import load_chirp
+from cruw.io.files import list_frame_ids, atomic_write
+
+PACK_MAGIC = b'CRUWPACK'
+PACK_VERSION = 1
+PACK_ALIGN = 4096
+
+
+def get_packed_path(seq_path, chirp_folder):
+    """Packed radar file of a sequence, e.g. '<seq_path>/RADAR_RA_H.pack'."""
+    return os.path.join(seq_path, chirp_folder + '.pack')
+
+
+def pack_sequence(chirp_dir, out_path, chirp_ids, frame_ids=None):
+    """
+    Pack per-frame radar chirp files of a sequence into one contiguous file.
+    File layout: magic, header length (uint32), json header (dtype, shape, frame_ids, chirp_ids),
+    padding to 4096 bytes, then the C-order array [n_frames x n_chirps x r x a x 2].
+    :param chirp_dir: radar folder of a sequence, e.g. 'sequences/<split>/<seq>/RADAR_RA_H'
+    :param out_path: output file path
+    :param chirp_ids: chirp ids to pack for each frame
+    :param frame_ids: frame ids to pack, all frames in chirp_dir if None
+    :return: out_path
+    """
+    if frame_ids is None:
+        frame_ids = list_frame_ids(chirp_dir, 'npy')
+    frame_ids = [int(frame_id) for frame_id in frame_ids]
+    chirp_ids = [int(chirp_id) for chirp_id in chirp_ids]
+    chirp_paths = [[os.path.join(chirp_dir, '%06d_%04d.npy' % (frame_id, chirp_id)) for chirp_id in chirp_ids]
+                   for frame_id in frame_ids]
+    first = load_chirp(chirp_paths[0][0])
+    header = dict(
+        version=PACK_VERSION,
+        dtype=first.dtype.str,
+        shape=[len(frame_ids), len(chirp_ids)] + list(first.shape),
+        frame_ids=frame_ids,
+        chirp_ids=chirp_ids,
+    )
+    header_bytes = json.dumps(header).encode()
+    offset = len(PACK_MAGIC) + 4 + len(header_bytes)
+    header_bytes += b' ' * (-offset % PACK_ALIGN)
+
+    with atomic_write(out_path) as f:
+        f.write(PACK_MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        for frame_paths in chirp_paths:
+            for chirp_path in frame_paths:
+                chirp = load_chirp(chirp_path)
+                if chirp.shape != first.shape or chirp.dtype != first.dtype:
+                    raise ValueError("chirp %s does not match the shape or dtype of the sequence" % chirp_path)
+                f.write(np.ascontiguousarray(chirp).tobytes())
+    return out_path
+
+
+class PackedSequence:
+    """ Reader of a packed radar sequence with random access by frame and chirp id. """
+
+    def __init__(self, pack_path):
+        self.pack_path = pack_path
+        with open(pack_path, 'rb') as f:
+            magic = f.read(len(PACK_MAGIC))
+            if magic != PACK_MAGIC:
+                raise ValueError("%s is not a packed radar sequence" % pack_path)
+            header_len, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_len).decode())
+        if header['version'] != PACK_VERSION:
+            raise ValueError("unsupported packed sequence version %s" % header['version'])
+        self.frame_ids = header['frame_ids']
+        self.chirp_ids = header['chirp_ids']
+        self.frame_index = {frame_id: i for i, frame_id in enumerate(self.frame_ids)}
+        self.chirp_index = {chirp_id: i for i, chirp_id in enumerate(self.chirp_ids)}
+        self.data = np.memmap(pack_path, dtype=np.dtype(header['dtype']), mode='r',
+                              offset=len(PACK_MAGIC) + 4 + header_len, shape=tuple(header['shape']))
+
+    def __len__(self):
+        return len(self.frame_ids)
+
+    @property
+    def n_frames(self):
+        return len(self.frame_ids)
+
+    def get_chirp(self, frame_id, chirp_id):
+        """Zero-copy read-only view of one chirp [r x a x 2]."""
+        return self.data[self.frame_index[frame_id], self.chirp_index[chirp_id]]
+
+    def load(self, frame_ids, chirp_ids=None, out=None):
+        """
+        Load radar data by frame and chirp ids, same addressing as the unpacked '<frame>_<chirp>.npy' files.
+        :param frame_ids: list of frame ids
+        :param chirp_ids: list of chirp ids, all packed chirps if None
+        :param out: preallocated buffer [n_frames x n_chirps x r x a x 2], allocated if None
+        :return: radar data [n_frames x n_chirps x r x a x 2]
+        """
+        finds = [self.frame_index[int(frame_id)] for frame_id in frame_ids]
+        if chirp_ids is None:
+            cinds = list(range(len(self.chirp_ids)))
+        else:
+            cinds = [self.chirp_index[int(chirp_id)] for chirp_id in chirp_ids]
+        out_shape = (len(finds), len(cinds)) + self.data.shape[2:]
+        if out is None:
+            out = np.empty(out_shape, dtype=self.data.dtype)
+        # consecutive frames are read as one contiguous block
+        if finds and finds == list(range(finds[0], finds[0] + len(finds))):
+            block = self.data[finds[0]:finds[0] + len(finds)]
+            if cinds == list(range(len(self.chirp_ids))):
+                out[...] = block
+            else:
+                out[...] = block[:, cinds]
+        else:
+            for i, find in enumerate(finds):
+                out[i] = self.data[find, cinds]
+        return out
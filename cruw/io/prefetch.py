@@ -0,0 +1,61 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FrameIterator:
+    """
+    Iterate frames in order while a thread pool reads ahead.
+    At most 'prefetch' frames are loaded but not yet consumed, so memory stays bounded.
+    The time spent waiting for frames that were not ready yet is reported as stall_time,
+    which helps to choose the prefetch depth and the number of workers.
+    """
+
+    def __init__(self, load_fn, frame_ids, prefetch=4, workers=2):
+        """
+        :param load_fn: function loading one frame from its frame id, must be thread-safe
+        :param frame_ids: frame ids to iterate
+        :param prefetch: number of frames to read ahead
+        :param workers: number of loader threads
+        """
+        self.load_fn = load_fn
+        self.frame_ids = list(frame_ids)
+        self.prefetch = max(1, prefetch)
+        self.workers = max(1, workers)
+        self.stall_time = 0.0
+        self.n_yielded = 0
+
+    def __len__(self):
+        return len(self.frame_ids)
+
+    def __iter__(self):
+        self.stall_time = 0.0
+        self.n_yielded = 0
+        frame_ids = iter(self.frame_ids)
+        futures = deque()
+        executor = ThreadPoolExecutor(self.workers)
+        try:
+            for frame_id in frame_ids:
+                futures.append(executor.submit(self.load_fn, frame_id))
+                if len(futures) >= self.prefetch:
+                    break
+            while futures:
+                future = futures.popleft()
+                tic = time.perf_counter()
+                frame = future.result()
+                self.stall_time += time.perf_counter() - tic
+                # keep the read-ahead queue full
+                for frame_id in frame_ids:
+                    futures.append(executor.submit(self.load_fn, frame_id))
+                    break
+                self.n_yielded += 1
+                yield frame
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    @property
+    def mean_stall_time(self):
+        """Average waiting time per yielded frame in seconds."""
+        return self.stall_time / self.n_yielded if self.n_yielded else 0.0
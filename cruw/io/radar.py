@@ -0,0 +1,29 @@
+import numpy as np
+
+
+def load_chirp(chirp_path):
+    """
+    Memory-map a radar chirp .npy file.
+    The returned array is a read-only view of the file, pages are shared through the OS page cache.
+    :param chirp_path: chirp file path
+    :return: read-only memmap [r x a x 2]
+    """
+    return np.load(chirp_path, mmap_mode='r')
+
+
+def load_chirps(chirp_paths, out=None):
+    """
+    Load radar chirps of several frames into one buffer.
+    :param chirp_paths: chirp file paths [n_frames][n_chirps]
+    :param out: preallocated buffer [n_frames x n_chirps x r x a x 2], allocated if None
+    :return: radar data [n_frames x n_chirps x r x a x 2]
+    """
+    n_frames = len(chirp_paths)
+    n_chirps = len(chirp_paths[0]) if n_frames else 0
+    for fi, frame_paths in enumerate(chirp_paths):
+        for ci, chirp_path in enumerate(frame_paths):
+            chirp = load_chirp(chirp_path)
+            if out is None:
+                out = np.empty((n_frames, n_chirps) + chirp.shape, dtype=chirp.dtype)
+            out[fi, ci] = chirp
+    return out
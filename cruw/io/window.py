@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class WindowIterator:
+    """
+    Iterate sliding windows of consecutive frames with a mirrored ring buffer.
+    Every frame is stored twice, at slot (i % win_size) and (i % win_size + win_size) of a buffer of
+    2 * win_size frames, so each window is a contiguous view of the buffer. Only the frames that are new
+    to a window are loaded, i.e. 'stride' frames per step instead of 'win_size'.
+    The yielded views are overwritten by the following steps, copy them if they need to be kept.
+    """
+
+    def __init__(self, load_fn, frame_ids, win_size, stride=1):
+        """
+        :param load_fn: function load_fn(frame_ids, out) loading frames into out [n_frames x ...]
+                        (allocated and returned if out is None)
+        :param frame_ids: frame ids to iterate, window i covers frame_ids[i * stride: i * stride + win_size]
+        :param win_size: number of frames in a window
+        :param stride: number of frames between the starts of two windows
+        """
+        if win_size < 1 or stride < 1:
+            raise ValueError("win_size and stride should be positive")
+        self.load_fn = load_fn
+        self.frame_ids = list(frame_ids)
+        self.win_size = win_size
+        self.stride = stride
+        self.buffer = None
+        self.n_loaded = 0
+
+    def __len__(self):
+        if len(self.frame_ids) < self.win_size:
+            return 0
+        return (len(self.frame_ids) - self.win_size) // self.stride + 1
+
+    def get_window_frame_ids(self, index):
+        start = index * self.stride
+        return self.frame_ids[start:start + self.win_size]
+
+    def __iter__(self):
+        self.n_loaded = 0
+        win_size = self.win_size
+        loaded_end = 0  # frames before this position in frame_ids are in the buffer
+        for index in range(len(self)):
+            start = index * self.stride
+            end = start + win_size
+            if self.buffer is None:
+                first = self.load_fn(self.frame_ids[start:end], None)
+                self.buffer = np.empty((2 * win_size,) + first.shape[1:], dtype=first.dtype)
+                self.buffer[:win_size] = first
+                self.buffer[win_size:] = first
+                self.n_loaded += win_size
+            else:
+                self._load(max(loaded_end, start), end)
+            loaded_end = end
+            offset = start % win_size
+            yield self.buffer[offset:offset + win_size]
+
+    def _load(self, begin, end):
+        """Load the frames at positions [begin, end) of frame_ids into their ring slots."""
+        win_size = self.win_size
+        while begin < end:
+            slot = begin % win_size
+            n = min(end - begin, win_size - slot)
+            self.load_fn(self.frame_ids[begin:begin + n], self.buffer[slot:slot + n])
+            self.buffer[slot + win_size:slot + win_size + n] = self.buffer[slot:slot + n]
+            self.n_loaded += n
+            begin += n
@@ -1,4 +1,7 @@
 from .coor_transform import cart2pol, pol2cart, cart2pol_ramap, pol2cart_ramap, radar2camera_xz, camera2radar_xz
+from .grid import Grid, is_analytic_grid, as_grid
 from .generate_grids import confmap2ra, labelmap2ra, get_xzgrid
-from .ops import find_nearest, ra2idx, idx2ra, ra2idx_interpolate, xz2idx_interpolate, idx2ra_interpolate
-from .rf_image import rf2rfcart
+from .ops import find_nearest, ra2idx, idx2ra, xz2raidx, ra2idx_interpolate, xz2idx_interpolate, idx2ra_interpolate
+from .rf_image import rf2rfcart, rf2rfcart_lut, rf2rfcart_batch, rf2rfcart_seq, \
+    rfcart2rf, rfcart2rf_lut, rfcart2rf_batch
+from .resample import ResampleOperator, build_resample_matrix
@@ -2,18 +2,20 @@ import numpy as np
 
 
 def ri2ap(mat_ri):
+    """Convert real/imaginary to amplitude/phase along the last axis, e.g. [r x a x 2] or [n x r x a x 2]."""
     mat_ap = np.zeros_like(mat_ri)
-    rf_complex = mat_ri[:, :, 0] + mat_ri[:, :, 1] * 1j
-    mat_ap[:, :, 0] = np.abs(rf_complex)
-    mat_ap[:, :, 1] = np.angle(rf_complex)
+    rf_complex = mat_ri[..., 0] + mat_ri[..., 1] * 1j
+    mat_ap[..., 0] = np.abs(rf_complex)
+    mat_ap[..., 1] = np.angle(rf_complex)
     return mat_ap
 
 
 def ap2ri(mat_ap):
+    """Convert amplitude/phase to real/imaginary along the last axis, e.g. [r x a x 2] or [n x r x a x 2]."""
     mat_ri = np.zeros_like(mat_ap)
-    rf_complex = mat_ap[:, :, 0] * np.exp(mat_ap[:, :, 1] * 1j)
-    mat_ri[:, :, 0] = np.real(rf_complex)
-    mat_ri[:, :, 1] = np.imag(rf_complex)
+    rf_complex = mat_ap[..., 0] * np.exp(mat_ap[..., 1] * 1j)
+    mat_ri[..., 0] = np.real(rf_complex)
+    mat_ri[..., 1] = np.imag(rf_complex)
     return mat_ri
 
 
@@ -1,6 +1,9 @@
 import numpy as np
 import math
-import scipy.constants
+
+from cruw.mapping.grid import Grid
+
+SPEED_OF_LIGHT = 299792458.0  # m/s, same as scipy.constants.speed_of_light
 
 
 def confmap2ra(radar_configs, name, radordeg='rad'):
@@ -17,24 +20,25 @@ def confmap2ra(radar_configs, name, radordeg='rad'):
     num_crop = radar_configs['crop_num']
     fft_Rang = radar_configs['ramap_rsize'] + 2 * num_crop
     fft_Ang = radar_configs['ramap_asize']
-    c = scipy.constants.speed_of_light
+    c = SPEED_OF_LIGHT
 
     if name == 'range':
         freq_res = Fs / fft_Rang
         freq_grid = np.arange(fft_Rang) * freq_res
         rng_grid = freq_grid * c / sweepSlope / 2
         rng_grid = rng_grid[num_crop:fft_Rang - num_crop]
-        return rng_grid
+        rng_step = freq_res * c / sweepSlope / 2
+        return Grid(rng_grid, 'linear', num_crop * rng_step, rng_step)
 
     if name == 'angle':
         # for [-90, 90], w will be [-1, 1]
-        w = np.linspace(math.sin(math.radians(radar_configs['ra_min'])),
-                        math.sin(math.radians(radar_configs['ra_max'])),
-                        radar_configs['ramap_asize'])
+        w, w_step = np.linspace(math.sin(math.radians(radar_configs['ra_min'])),
+                                math.sin(math.radians(radar_configs['ra_max'])),
+                                radar_configs['ramap_asize'], retstep=True)
         if radordeg == 'deg':
             agl_grid = np.degrees(np.arcsin(w))  # rad to deg
         elif radordeg == 'rad':
-            agl_grid = np.arcsin(w)
+            agl_grid = Grid(np.arcsin(w), 'arcsin', w[0], w_step)
         else:
             raise TypeError
         return agl_grid
@@ -54,7 +58,7 @@ def labelmap2ra(radar_configs, name, radordeg='rad'):
     num_crop = radar_configs['crop_num']
     fft_Rang = radar_configs['ramap_rsize_label'] + 2 * num_crop
     fft_Ang = radar_configs['ramap_asize_label']
-    c = scipy.constants.speed_of_light
+    c = SPEED_OF_LIGHT
 
     if name == 'range':
         freq_res = Fs / fft_Rang
@@ -62,19 +66,20 @@ def labelmap2ra(radar_configs, name, radordeg='rad'):
         rng_grid = freq_grid * c / sweepSlope / 2
         rng_grid = rng_grid[num_crop:fft_Rang - num_crop]
         rng_grid = np.flip(rng_grid)
-        return rng_grid
+        rng_step = freq_res * c / sweepSlope / 2
+        return Grid(rng_grid, 'linear', (fft_Rang - num_crop - 1) * rng_step, -rng_step)
 
     if name == 'angle':
         if radordeg == 'rad':
-            agl_grid = np.linspace(math.radians(radar_configs['ra_min_label']),
-                                   math.radians(radar_configs['ra_max_label']),
-                                   radar_configs['ramap_asize_label'])  # deg to rad
+            agl_grid, agl_step = np.linspace(math.radians(radar_configs['ra_min_label']),
+                                             math.radians(radar_configs['ra_max_label']),
+                                             radar_configs['ramap_asize_label'], retstep=True)  # deg to rad
         elif radordeg == 'deg':
-            agl_grid = np.linspace(radar_configs['ra_min_label'], radar_configs['ra_max_label'],
-                                   radar_configs['ramap_asize_label'])  # keep deg
+            agl_grid, agl_step = np.linspace(radar_configs['ra_min_label'], radar_configs['ra_max_label'],
+                                             radar_configs['ramap_asize_label'], retstep=True)  # keep deg
         else:
             raise TypeError
-        return agl_grid
+        return Grid(agl_grid, 'linear', agl_grid[0], agl_step)
 
 
 def get_xzgrid(xz_dim, zrange):
@@ -86,9 +91,9 @@ def get_xzgrid(xz_dim, zrange):
     origin = np.array([0, int(xz_dim[1] / 2)])
     zline, zreso = np.linspace(0, zrange, num=xz_dim[0], endpoint=False, retstep=True)
     xmax = zreso * (origin[1] + 1)
-    xline = np.linspace(0, xmax, num=origin[1] + 1, endpoint=False)
+    xline, xreso = np.linspace(0, xmax, num=origin[1] + 1, endpoint=False, retstep=True)
     xline = np.concatenate([np.flip(-xline[1:]), xline])
-    return xline, zline
+    return Grid(xline, 'linear', xline[0], xreso), Grid(zline, 'linear', 0, zreso)
 
 
 if __name__ == '__main__':
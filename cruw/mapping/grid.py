@@ -0,0 +1,116 @@
+import numpy as np
+
+GRID_MAPPINGS = ('linear', 'arcsin')
+
+
+class Grid(np.ndarray):
+    """
+    1D coordinate grid (range, angle, x or z) that keeps the parameters it is generated from:
+        'linear': value = start + step * idx
+        'arcsin': value = arcsin(start + step * idx)
+    so that index <-> value conversions are closed-form instead of searching the grid.
+    Copies (copy, copy.copy, copy.deepcopy, pickling) keep the parameters. Other arrays derived from a grid
+    (slices, flips, arithmetic results) drop them, and their conversions fall back to interpolation.
+    """
+
+    def __new__(cls, values, mapping, start, step):
+        """
+        :param values: grid values
+        :param mapping: 'linear' or 'arcsin'
+        :param start: value (or sine of the value for 'arcsin') at index 0
+        :param step: increment per index
+        """
+        if mapping not in GRID_MAPPINGS:
+            raise ValueError("unknown grid mapping %s" % mapping)
+        obj = np.asarray(values).view(cls)
+        obj.params = dict(mapping=mapping, start=float(start), step=float(step))
+        return obj
+
+    def __array_finalize__(self, obj):
+        # derived arrays are not guaranteed to follow the generating parameters
+        self.params = None
+
+    def copy(self, order='C'):
+        out = super().copy(order=order)
+        out.params = None if self.params is None else dict(self.params)
+        return out
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def __reduce__(self):
+        reconstruct, args, state = super().__reduce__()
+        return reconstruct, args, (state, self.params)
+
+    def __setstate__(self, state):
+        state, params = state
+        super().__setstate__(state)
+        self.params = params
+
+    @property
+    def is_analytic(self):
+        return self.params is not None
+
+    def idx2value(self, idx):
+        """
+        Map float indices (scalars or arrays) to grid values, indices are clipped to [0, n - 1].
+        :param idx: indices
+        :return: values
+        """
+        idx = np.clip(np.asarray(idx, dtype=float), 0, self.shape[0] - 1)
+        if self.params is None:
+            return np.interp(idx, np.arange(self.shape[0]), self.view(np.ndarray))
+        value = self.params['start'] + self.params['step'] * idx
+        if self.params['mapping'] == 'arcsin':
+            value = np.arcsin(np.clip(value, -1, 1))
+        return value
+
+    def value2idx(self, value):
+        """
+        Map grid values (scalars or arrays) to float indices, clipped to [0, n - 1].
+        :param value: values
+        :return: indices
+        """
+        value = np.asarray(value, dtype=float)
+        n = self.shape[0]
+        if self.params is None:
+            grid = self.view(np.ndarray)
+            if n > 1 and grid[0] > grid[-1]:
+                return n - 1 - np.interp(value, grid[::-1], np.arange(n))
+            return np.interp(value, grid, np.arange(n))
+        if self.params['mapping'] == 'arcsin':
+            value = np.sin(value)
+        idx = (value - self.params['start']) / self.params['step']
+        return np.clip(idx, 0, n - 1)
+
+
+def is_analytic_grid(grid):
+    """Check whether a grid supports closed-form index <-> value conversions."""
+    return isinstance(grid, Grid) and grid.is_analytic
+
+
+def as_grid(values):
+    """
+    View a 1D array as a Grid, so that all grids are converted the same way whatever their array type.
+    The parameters of plain arrays are inferred if they are evenly spaced ('linear'), or their sines are
+    ('arcsin', e.g. the confmap angle grid). Otherwise, conversions interpolate the values, which also
+    handles descending grids (e.g. range_grid_label).
+    :param values: Grid or 1D array
+    :return: Grid
+    """
+    if is_analytic_grid(values):
+        return values
+    values = np.asarray(values)
+    n = values.shape[0]
+    if n >= 2:
+        candidates = [('linear', values.astype(float))]
+        if np.all(np.abs(values) <= np.pi / 2):
+            candidates.append(('arcsin', np.sin(values.astype(float))))
+        for mapping, coords in candidates:
+            step = (coords[-1] - coords[0]) / (n - 1)
+            if step != 0 and np.all(np.abs(np.diff(coords) - step) <= 1e-6 * abs(step)):
+                return Grid(values, mapping, coords[0], step)
+    return values.view(Grid)
@@ -1,57 +1,85 @@
 import numpy as np
 
 from cruw.mapping.coor_transform import pol2cart_ramap, cart2pol_ramap
+from cruw.mapping.grid import as_grid
 
 
 def find_nearest(array, value):
-    """Find nearest value to 'value' in 'array'."""
+    """
+    Find nearest value to 'value' in 'array'.
+    For monotonic arrays (e.g. ascending or descending range grids), a binary search is used,
+    otherwise all elements are compared. Ties are resolved to the first occurrence, same as argmin.
+    :param array: 1D array
+    :param value: a scalar or an array of values
+    :return: indices and nearest values, in the shape of 'value'
+    """
     array = np.asarray(array)
-    idx = (np.abs(array - value)).argmin()
+    value = np.asarray(value)
+    n = array.shape[0]
+    if n < 2:
+        idx = np.zeros(value.shape, dtype=np.int64)
+    else:
+        diff = np.diff(array)
+        if np.all(diff > 0):
+            idx = _search_nearest(array, value, prefer_right=False)
+        elif np.all(diff < 0):
+            # the first occurrence in a descending array is the right one of its reverse
+            idx = n - 1 - _search_nearest(array[::-1], value, prefer_right=True)
+        else:
+            idx = np.abs(array - value[..., None]).argmin(axis=-1)
+    if idx.ndim == 0:
+        idx = idx[()]
     return idx, array[idx]
 
 
+def _search_nearest(array, value, prefer_right):
+    """Nearest indices in a strictly ascending array with searchsorted."""
+    right = np.clip(np.searchsorted(array, value, side='left'), 1, array.shape[0] - 1)
+    left = right - 1
+    dist_left = np.abs(array[left] - value)
+    dist_right = np.abs(array[right] - value)
+    if prefer_right:
+        return np.where(dist_right <= dist_left, right, left)
+    return np.where(dist_right < dist_left, right, left)
+
+
 def idx2ra(rng_id, agl_id, range_grid, angle_grid):
-    """Mapping from ra indices to absolute range (m) and azimuth (rad)."""
+    """Mapping from ra indices (scalars or arrays) to absolute range (m) and azimuth (rad)."""
     rng = range_grid[rng_id]
     agl = angle_grid[agl_id]
     return rng, agl
 
 
 def idx2ra_interpolate(rng_id, agl_id, range_grid, angle_grid):
-    """Mapping from ra indices to absolute range (m) and azimuth (rad)."""
-    rids = np.arange(range_grid.shape[0])
-    aids = np.arange(angle_grid.shape[0])
-    rng = np.interp(rng_id, rids, range_grid)
-    agl = np.interp(agl_id, aids, angle_grid)
+    """Mapping from ra indices to absolute range (m) and azimuth (rad), closed-form for analytic grids."""
+    rng = as_grid(range_grid).idx2value(rng_id)
+    agl = as_grid(angle_grid).idx2value(agl_id)
     return rng, agl
 
 
 def ra2idx(rng, agl, range_grid, angle_grid):
-    """Mapping from absolute range (m) and azimuth (rad) to ra indices."""
+    """Mapping from absolute range (m) and azimuth (rad) (scalars or arrays) to ra indices."""
     rng_id, _ = find_nearest(range_grid, rng)
     agl_id, _ = find_nearest(angle_grid, agl)
     return rng_id, agl_id
 
 
 def ra2idx_interpolate(rng, agl, range_grid, angle_grid):
-    """get interpolated RA indices in float"""
-    rids = np.arange(range_grid.shape[0])
-    aids = np.arange(angle_grid.shape[0])
-    rng_id = np.interp(rng, range_grid, rids)
-    agl_id = np.interp(np.sin(agl), np.sin(angle_grid), aids)
+    """get interpolated RA indices in float, closed-form for analytic grids"""
+    rng_id = as_grid(range_grid).value2idx(rng)
+    agl_id = as_grid(angle_grid).value2idx(agl)
     return rng_id, agl_id
 
 
 def xz2idx_interpolate(x, z, x_grid, z_grid):
-    """get interpolated XZ indices in float"""
-    xids = np.arange(x_grid.shape[0])
-    zids = np.arange(z_grid.shape[0])
-    x_id = np.interp(x, x_grid, xids)
-    z_id = np.interp(z, z_grid, zids)
+    """get interpolated XZ indices in float, closed-form for analytic grids"""
+    x_id = as_grid(x_grid).value2idx(x)
+    z_id = as_grid(z_grid).value2idx(z)
     return x_id, z_id
 
 
 def xz2raidx(x, z, range_grid, angle_grid):
+    """Mapping from BEV x, z (m) (scalars or arrays) to ra indices."""
     rng, agl = cart2pol_ramap(x, z)
     rng_id, agl_id = ra2idx(rng, agl, range_grid, angle_grid)
     return rng_id, agl_id
@@ -94,3 +122,51 @@ def bilinear_interpolate(im, x, y):
     wd = (x - x0) * (y - y0)
 
     return wa * Ia + wb * Ib + wc * Ic + wd * Id
+
+
+def bilinear_lut(x, y, shape):
+    """
+    Precompute the sampling indices and weights of bilinear_interpolate, so that the same sampling
+    can be applied to many images with a single gather.
+    :param x: float column indices
+    :param y: float row indices
+    :param shape: (n_rows, n_cols) of the images to be sampled
+    :return: inds [..., 4] flattened image indices, weights [..., 4] bilinear weights
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n_rows, n_cols = shape[:2]
+
+    x0 = np.floor(x).astype(int)
+    x1 = x0 + 1
+    y0 = np.floor(y).astype(int)
+    y1 = y0 + 1
+
+    x0 = np.clip(x0, 0, n_cols - 1)
+    x1 = np.clip(x1, 0, n_cols - 1)
+    y0 = np.clip(y0, 0, n_rows - 1)
+    y1 = np.clip(y1, 0, n_rows - 1)
+
+    wa = (x1 - x) * (y1 - y)
+    wb = (x1 - x) * (y - y0)
+    wc = (x - x0) * (y1 - y)
+    wd = (x - x0) * (y - y0)
+
+    inds = np.stack([y0 * n_cols + x0, y1 * n_cols + x0, y0 * n_cols + x1, y1 * n_cols + x1], axis=-1)
+    weights = np.stack([wa, wb, wc, wd], axis=-1)
+    return inds, weights
+
+
+def bilinear_interpolate_lut(im, lut):
+    """
+    Bilinear interpolation with a sampling LUT from bilinear_lut.
+    :param im: image [n_rows x n_cols x ...]
+    :param lut: (inds, weights) from bilinear_lut
+    :return: interpolated values [lut_shape x ...]
+    """
+    inds, weights = lut
+    im = np.asarray(im)
+    im_flat = im.reshape((-1,) + im.shape[2:])
+    values = im_flat[inds]
+    weights = weights.reshape(weights.shape + (1,) * (im.ndim - 2))
+    return np.sum(values * weights, axis=inds.ndim - 1)
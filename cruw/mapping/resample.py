@@ -0,0 +1,175 @@
+import os
+import hashlib
+
+import numpy as np
+
+from cruw.mapping.coor_transform import cart2pol_ramap, pol2cart_ramap
+from cruw.mapping.ops import ra2idx_interpolate, xz2idx_interpolate, bilinear_lut
+
+
+def get_grid_shape(grid_type, grids):
+    """Image shape of a grid: [r x a] for 'ra' grids (range_grid, angle_grid), [z x x] for 'xz' grids (xline, zline)."""
+    if grid_type == 'ra':
+        return len(grids[0]), len(grids[1])
+    if grid_type == 'xz':
+        return len(grids[1]), len(grids[0])
+    raise ValueError("unknown grid type %s" % grid_type)
+
+
+def get_grids_fingerprint(src_type, src_grids, dst_type, dst_grids):
+    """Hash of the grid types and values of an operator, to check that a saved operator matches the grids."""
+    sha = hashlib.sha1()
+    for grid_type, grids in ((src_type, src_grids), (dst_type, dst_grids)):
+        sha.update(grid_type.encode())
+        for grid in grids:
+            values = np.ascontiguousarray(grid, dtype=np.float64)
+            sha.update(str(values.shape).encode())
+            sha.update(values.tobytes())
+    return sha.hexdigest()
+
+
+def _get_grid_points(grid_type, grids):
+    """Range (m) and azimuth (rad) of every pixel of a grid image."""
+    if grid_type == 'ra':
+        return np.meshgrid(np.asarray(grids[0]), np.asarray(grids[1]), indexing='ij')
+    if grid_type == 'xz':
+        x, z = np.meshgrid(np.asarray(grids[0]), np.asarray(grids[1]))
+        return cart2pol_ramap(x, z)
+    raise ValueError("unknown grid type %s" % grid_type)
+
+
+def _clip_index(idx, n):
+    # bilinear_lut gives zero weights at exactly the last index, stay just below it
+    return np.clip(idx, 0, max(n - 1 - 1e-9, 0))
+
+
+def _inside(values, grid):
+    # tolerate round-off of the polar <-> cart conversions at the borders
+    low, high = np.min(grid), np.max(grid)
+    eps = 1e-9 * (high - low)
+    return (values >= low - eps) & (values <= high + eps)
+
+
+def build_resample_matrix(src_type, src_grids, dst_type, dst_grids):
+    """
+    Build the bilinear interpolation matrix from one grid to another.
+    Destination pixels outside of the extent of the source grid are 0.
+    :param src_type: 'ra' for (range_grid, angle_grid) grids, 'xz' for BEV (xline, zline) grids
+    :param src_grids: source grids
+    :param dst_type: 'ra' or 'xz'
+    :param dst_grids: destination grids
+    :return: scipy.sparse.csr_matrix [n_dst_pixels x n_src_pixels]
+    """
+    # scipy is only needed when operators are built
+    import scipy.sparse
+
+    rng, agl = _get_grid_points(dst_type, dst_grids)
+    src_shape = get_grid_shape(src_type, src_grids)
+    if src_type == 'ra':
+        range_grid, angle_grid = src_grids
+        rid, aid = ra2idx_interpolate(rng, agl, range_grid, angle_grid)
+        inds, weights = bilinear_lut(_clip_index(aid, src_shape[1]), _clip_index(rid, src_shape[0]), src_shape)
+        inside = _inside(rng, range_grid) & _inside(agl, angle_grid)
+    elif src_type == 'xz':
+        xline, zline = src_grids
+        x, z = pol2cart_ramap(rng, agl)
+        x_id, z_id = xz2idx_interpolate(x, z, xline, zline)
+        inds, weights = bilinear_lut(_clip_index(x_id, src_shape[1]), _clip_index(z_id, src_shape[0]), src_shape)
+        inside = _inside(x, xline) & _inside(z, zline)
+    else:
+        raise ValueError("unknown grid type %s" % src_type)
+
+    weights = (weights * inside[..., None]).reshape(-1, 4)
+    inds = inds.reshape(-1, 4)
+    rows = np.repeat(np.arange(inds.shape[0]), 4)
+    matrix = scipy.sparse.coo_matrix((weights.ravel(), (rows, inds.ravel())),
+                                     shape=(inds.shape[0], src_shape[0] * src_shape[1])).tocsr()
+    matrix.eliminate_zeros()
+    return matrix
+
+
+class ResampleOperator:
+    """
+    Sparse bilinear resampling operator between two grids, e.g. confmap RA grid -> label grid -> BEV grid.
+    Applying it to a batch of images is one sparse matrix product, channels are resampled independently.
+    """
+
+    def __init__(self, matrix, src_shape, dst_shape, fingerprint=None):
+        """
+        :param matrix: scipy.sparse matrix [n_dst_pixels x n_src_pixels]
+        :param src_shape: source image shape
+        :param dst_shape: destination image shape
+        :param fingerprint: hash of the grids the operator is built from, see get_grids_fingerprint
+        """
+        self.matrix = matrix
+        self.src_shape = tuple(src_shape)
+        self.dst_shape = tuple(dst_shape)
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, src_type, src_grids, dst_type, dst_grids):
+        """Build the operator from the grids, see build_resample_matrix."""
+        matrix = build_resample_matrix(src_type, src_grids, dst_type, dst_grids)
+        return cls(matrix, get_grid_shape(src_type, src_grids), get_grid_shape(dst_type, dst_grids),
+                   fingerprint=get_grids_fingerprint(src_type, src_grids, dst_type, dst_grids))
+
+    @classmethod
+    def load_or_build(cls, path, src_type, src_grids, dst_type, dst_grids):
+        """
+        Load the operator saved at path if it was built from the same grids, otherwise build and save it there.
+        :param path: .npz file path
+        :return: ResampleOperator
+        """
+        fingerprint = get_grids_fingerprint(src_type, src_grids, dst_type, dst_grids)
+        if os.path.exists(path):
+            try:
+                op = cls.load(path)
+            except (OSError, ValueError, KeyError):
+                op = None
+            if op is not None and op.fingerprint == fingerprint:
+                return op
+        op = cls.build(src_type, src_grids, dst_type, dst_grids)
+        op.save(path)
+        return op
+
+    def __call__(self, images):
+        return self.apply(images)
+
+    def apply(self, images):
+        """
+        Resample a batch of images.
+        :param images: [n x h x w] or [n x h x w x c] in the source shape
+        :return: resampled images [n x h' x w'] or [n x h' x w' x c] in the destination shape
+        """
+        images = np.asarray(images)
+        if images.shape[1:3] != self.src_shape:
+            raise ValueError("image shape %s does not match the source shape %s" % (images.shape, self.src_shape))
+        n_images = images.shape[0]
+        channel_shape = images.shape[3:]
+        # [n_src_pixels x (n_images * n_channels)]
+        values = np.moveaxis(images.reshape((n_images, -1) + channel_shape), 1, 0)
+        values = values.reshape(values.shape[0], -1)
+        out = self.matrix.dot(values)
+        if np.issubdtype(images.dtype, np.floating):
+            out = out.astype(images.dtype, copy=False)
+        out = np.moveaxis(out.reshape((-1, n_images) + channel_shape), 0, 1)
+        return out.reshape((n_images,) + self.dst_shape + channel_shape)
+
+    def save(self, path):
+        """Save the operator to an .npz file."""
+        matrix = self.matrix.tocsr()
+        np.savez(path, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                 shape=np.array(matrix.shape), src_shape=np.array(self.src_shape), dst_shape=np.array(self.dst_shape),
+                 fingerprint=np.array(self.fingerprint or ''))
+
+    @classmethod
+    def load(cls, path):
+        """Load an operator saved by save."""
+        import scipy.sparse
+        with np.load(path) as data:
+            matrix = scipy.sparse.csr_matrix((data['data'], data['indices'], data['indptr']),
+                                             shape=tuple(data['shape']))
+            src_shape = tuple(int(size) for size in data['src_shape'])
+            dst_shape = tuple(int(size) for size in data['dst_shape'])
+            fingerprint = str(data['fingerprint']) if 'fingerprint' in data else ''
+        return cls(matrix, src_shape, dst_shape, fingerprint=fingerprint or None)
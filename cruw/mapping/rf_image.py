@@ -1,38 +1,55 @@
+import os
+import functools
+import multiprocessing
 import numpy as np
 
 import cruw
-from cruw.mapping.coor_transform import cart2pol_ramap
-from cruw.mapping.ops import ra2idx, ra2idx_interpolate, bilinear_interpolate
+from cruw.mapping.coor_transform import cart2pol_ramap, pol2cart_ramap
+from cruw.mapping.ops import ra2idx_interpolate, xz2idx_interpolate, bilinear_lut, bilinear_interpolate_lut
 from cruw.mapping.complex import ri2ap, ap2ri
+from cruw.io.files import list_frame_ids
 
 
-def rf2rfcart(rfim, range_grid, angle_grid, xz_grid, magnitude_only=True):
+def rf2rfcart_lut(range_grid, angle_grid, xz_grid):
+    """
+    Precompute the bilinear sampling LUT from RF images to cart coordinates.
+    The LUT only depends on the grids, so it can be computed once and reused for all frames.
+    :param range_grid: range grid of RF images
+    :param angle_grid: angle grid of RF images
+    :param xz_grid: BEV grids (xline, zline)
+    :return: (inds, weights) LUT, each with shape [len(zline) x len(xline) x 4]
+    """
+    xline, zline = xz_grid
+    x, z = np.meshgrid(xline, zline)
+    rng, agl = cart2pol_ramap(x, z)
+    rid_inter, aid_inter = ra2idx_interpolate(rng, agl, range_grid, angle_grid)
+    return bilinear_lut(aid_inter, rid_inter, (len(range_grid), len(angle_grid)))
+
+
+def rf2rfcart(rfim, range_grid, angle_grid, xz_grid, magnitude_only=True, lut=None):
     """
     Convert RF images to cart coordinates
     :param rfim: RF image data
     :param range_grid:
     :param angle_grid:
-    :param dim: output cart RF image dimension
-    :param zrange: largest range in z axis (in meter)
+    :param xz_grid: BEV grids (xline, zline)
     :param magnitude_only: convert magnitude map only
+    :param lut: precomputed LUT from rf2rfcart_lut, computed from the grids if not given
     """
     xline, zline = xz_grid
-    dim = (len(zline), len(xline))
+    if lut is None:
+        lut = rf2rfcart_lut(range_grid, angle_grid, xz_grid)
 
     if magnitude_only:
-        rf_cart = np.zeros([dim[0], dim[1], 1])
         rfim = np.sqrt(rfim[:, :, 0] ** 2 + rfim[:, :, 1] ** 2)
     else:
-        rf_cart = np.zeros([dim[0], dim[1], 2])
         rfim = ri2ap(rfim)
 
-    for zi in range(dim[0]):
-        for xi in range(dim[1]):
-            x, z = xline[xi], zline[zi]
-            rng, agl = cart2pol_ramap(x, z)
-            # rid, aid = ra2idx(rng, agl, range_grid, angle_grid)
-            rid_inter, aid_inter = ra2idx_interpolate(rng, agl, range_grid, angle_grid)
-            rf_cart[zi, xi] = bilinear_interpolate(rfim, aid_inter, rid_inter)
+    inds, weights = lut
+    if np.issubdtype(rfim.dtype, np.floating):
+        # keep the input precision, the same as rf2rfcart_batch
+        weights = weights.astype(rfim.dtype)
+    rf_cart = bilinear_interpolate_lut(rfim, (inds, weights))
 
     if not magnitude_only:
         rf_cart = ap2ri(rf_cart)
@@ -40,9 +57,205 @@ def rf2rfcart(rfim, range_grid, angle_grid, xz_grid, magnitude_only=True):
     return np.squeeze(rf_cart), (xline, zline)
 
 
+def _rf2rfcart_chunk(rfims, lut, magnitude_only):
+    """Convert a chunk of RF images [n x r x a x 2] to cart coordinates."""
+    if magnitude_only:
+        rfims = np.sqrt(rfims[..., 0] ** 2 + rfims[..., 1] ** 2)
+    else:
+        rfims = ri2ap(rfims)
+    # put the batch axis behind the RA axes so that the LUT gathers all frames at once
+    rf_cart = bilinear_interpolate_lut(np.moveaxis(rfims, 0, 2), lut)
+    rf_cart = np.moveaxis(rf_cart, 2, 0)
+    if not magnitude_only:
+        rf_cart = ap2ri(rf_cart)
+    return rf_cart
+
+
+_worker_args = {}
+
+
+def _init_worker(lut, magnitude_only):
+    # only used in pool workers, each worker process has its own copy of the globals
+    _worker_args['lut'] = lut
+    _worker_args['magnitude_only'] = magnitude_only
+
+
+def _run_worker_task(func, task):
+    return func(task, _worker_args['lut'], _worker_args['magnitude_only'])
+
+
+def _convert_array_chunk(rfims, lut, magnitude_only):
+    return _rf2rfcart_chunk(rfims, lut, magnitude_only)
+
+
+def _convert_file_chunk(paths, lut, magnitude_only):
+    rfims = np.stack([np.stack([np.load(path) for path in frame_paths]) for frame_paths in paths])
+    n_frames, n_chirps = rfims.shape[:2]
+    rfims = rfims.reshape((n_frames * n_chirps,) + rfims.shape[2:])
+    rf_cart = _rf2rfcart_chunk(rfims, lut, magnitude_only)
+    return rf_cart.reshape((n_frames, n_chirps) + rf_cart.shape[1:])
+
+
+def _run_chunks(func, tasks, out, lut, magnitude_only, n_workers):
+    """Run func(task, lut, magnitude_only) on each (start, end, task), writing the results to out[start:end]."""
+    if n_workers > 0:
+        with multiprocessing.Pool(n_workers, initializer=_init_worker, initargs=(lut, magnitude_only)) as pool:
+            results = pool.imap(functools.partial(_run_worker_task, func), [task for _, _, task in tasks])
+            for (start, end, _), res in zip(tasks, results):
+                out[start:end] = res
+    else:
+        for start, end, task in tasks:
+            out[start:end] = func(task, lut, magnitude_only)
+    return out
+
+
+def rf2rfcart_batch(rfims, range_grid, angle_grid, xz_grid, magnitude_only=True, lut=None,
+                    out=None, n_workers=0, chunk_size=32):
+    """
+    Convert a batch of RF images to cart coordinates
+    :param rfims: RF image data [n x r x a x 2]
+    :param range_grid:
+    :param angle_grid:
+    :param xz_grid: BEV grids (xline, zline)
+    :param magnitude_only: convert magnitude map only
+    :param lut: precomputed LUT from rf2rfcart_lut, computed from the grids if not given
+    :param out: preallocated output buffer [n x z x x] (magnitude only) or [n x z x x x 2]
+    :param n_workers: number of worker processes, 0 to convert in the current process
+    :param chunk_size: number of RF images converted in one gather
+    :return: RF images in cart coordinates, same as out if given
+    """
+    xline, zline = xz_grid
+    if lut is None:
+        lut = rf2rfcart_lut(range_grid, angle_grid, xz_grid)
+    n_images = rfims.shape[0]
+    out_shape = (n_images, len(zline), len(xline)) if magnitude_only else (n_images, len(zline), len(xline), 2)
+    if out is None:
+        out = np.zeros(out_shape, dtype=rfims.dtype)
+    elif out.shape != out_shape:
+        raise ValueError("output buffer shape %s does not match %s" % (out.shape, out_shape))
+
+    tasks = [(start, min(start + chunk_size, n_images), rfims[start:start + chunk_size])
+             for start in range(0, n_images, chunk_size)]
+    return _run_chunks(_convert_array_chunk, tasks, out, lut, magnitude_only, n_workers)
+
+
+def rf2rfcart_seq(chirp_dir, chirp_ids, range_grid, angle_grid, xz_grid, magnitude_only=True, lut=None,
+                  out=None, out_path=None, n_workers=0, chunk_size=8, dtype=np.float32):
+    """
+    Convert all RF images in a sequence to cart coordinates
+    :param chirp_dir: radar folder of a sequence, e.g. 'sequences/<split>/<seq>/RADAR_RA_H'
+    :param chirp_ids: chirps to convert for each frame, e.g. radar_cfg['chirp_ids']
+    :param range_grid:
+    :param angle_grid:
+    :param xz_grid: BEV grids (xline, zline)
+    :param magnitude_only: convert magnitude map only
+    :param lut: precomputed LUT from rf2rfcart_lut, computed from the grids if not given
+    :param out: preallocated output buffer [n_frames x n_chirps x z x x (x 2)]
+    :param out_path: write results to this .npy file instead of an in-memory buffer
+    :param n_workers: number of worker processes, 0 to convert in the current process
+    :param chunk_size: number of frames loaded and converted by one task
+    :param dtype: dtype of the output when out is not given
+    :return: RF images in cart coordinates [n_frames x n_chirps x z x x (x 2)]
+    """
+    xline, zline = xz_grid
+    if lut is None:
+        lut = rf2rfcart_lut(range_grid, angle_grid, xz_grid)
+    frame_ids = list_frame_ids(chirp_dir, 'npy')
+    n_frames = len(frame_ids)
+    out_shape = (n_frames, len(chirp_ids), len(zline), len(xline))
+    if not magnitude_only:
+        out_shape += (2,)
+    if out is None:
+        if out_path is not None:
+            out = np.lib.format.open_memmap(out_path, mode='w+', dtype=dtype, shape=out_shape)
+        else:
+            out = np.zeros(out_shape, dtype=dtype)
+    elif out.shape != out_shape:
+        raise ValueError("output buffer shape %s does not match %s" % (out.shape, out_shape))
+
+    paths = [[os.path.join(chirp_dir, '%06d_%04d.npy' % (frame_id, chirp_id)) for chirp_id in chirp_ids]
+             for frame_id in frame_ids]
+    tasks = [(start, min(start + chunk_size, n_frames), paths[start:start + chunk_size])
+             for start in range(0, n_frames, chunk_size)]
+    out = _run_chunks(_convert_file_chunk, tasks, out, lut, magnitude_only, n_workers)
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+def rfcart2rf_lut(range_grid, angle_grid, xz_grid):
+    """
+    Precompute the bilinear sampling LUT from cart coordinates back to RF images.
+    RA bins outside of the extent of xz_grid get zero weights, so they are sampled as 0.
+    :param range_grid: range grid of RF images
+    :param angle_grid: angle grid of RF images
+    :param xz_grid: BEV grids (xline, zline)
+    :return: (inds, weights) LUT, each with shape [len(range_grid) x len(angle_grid) x 4]
+    """
+    xline, zline = xz_grid
+    rng, agl = np.meshgrid(np.asarray(range_grid), np.asarray(angle_grid), indexing='ij')
+    x, z = pol2cart_ramap(rng, agl)
+    x_id, z_id = xz2idx_interpolate(x, z, xline, zline)
+    inds, weights = bilinear_lut(x_id, z_id, (len(zline), len(xline)))
+    inside = (x >= np.min(xline)) & (x <= np.max(xline)) & (z >= np.min(zline)) & (z <= np.max(zline))
+    return inds, weights * inside[..., None]
+
+
+def rfcart2rf(rfcart, range_grid, angle_grid, xz_grid, lut=None):
+    """
+    Convert an image in cart coordinates (e.g. BEV model outputs or label maps) back to RA coordinates
+    :param rfcart: image in cart coordinates [z x x] or [z x x x c], channels are resampled independently
+    :param range_grid:
+    :param angle_grid:
+    :param xz_grid: BEV grids (xline, zline)
+    :param lut: precomputed LUT from rfcart2rf_lut, computed from the grids if not given
+    :return: image in RA coordinates [r x a] or [r x a x c]
+    """
+    if lut is None:
+        lut = rfcart2rf_lut(range_grid, angle_grid, xz_grid)
+    rfcart = np.asarray(rfcart)
+    inds, weights = lut
+    if np.issubdtype(rfcart.dtype, np.floating):
+        weights = weights.astype(rfcart.dtype)
+    return bilinear_interpolate_lut(rfcart, (inds, weights))
+
+
+def rfcart2rf_batch(rfcarts, range_grid, angle_grid, xz_grid, lut=None, out=None, chunk_size=32):
+    """
+    Convert a batch of images in cart coordinates back to RA coordinates
+    :param rfcarts: images in cart coordinates [n x z x x] or [n x z x x x c]
+    :param range_grid:
+    :param angle_grid:
+    :param xz_grid: BEV grids (xline, zline)
+    :param lut: precomputed LUT from rfcart2rf_lut, computed from the grids if not given
+    :param out: preallocated output buffer [n x r x a] or [n x r x a x c]
+    :param chunk_size: number of images converted in one gather
+    :return: images in RA coordinates, same as out if given
+    """
+    if lut is None:
+        lut = rfcart2rf_lut(range_grid, angle_grid, xz_grid)
+    inds, weights = lut
+    n_images, n_z, n_x = rfcarts.shape[:3]
+    channel_shape = rfcarts.shape[3:]
+    out_shape = (n_images,) + inds.shape[:-1] + channel_shape
+    if out is None:
+        out = np.zeros(out_shape, dtype=rfcarts.dtype)
+    elif out.shape != out_shape:
+        raise ValueError("output buffer shape %s does not match %s" % (out.shape, out_shape))
+
+    weights = weights.reshape(weights.shape + (1,) * len(channel_shape))
+    if np.issubdtype(rfcarts.dtype, np.floating):
+        weights = weights.astype(rfcarts.dtype)
+    for start in range(0, n_images, chunk_size):
+        chunk = rfcarts[start:start + chunk_size]
+        values = chunk.reshape((len(chunk), n_z * n_x) + channel_shape)[:, inds]
+        out[start:start + chunk_size] = np.sum(values * weights, axis=inds.ndim)
+    return out
+
+
 if __name__ == '__main__':
     cruw = cruw.CRUW(data_root='/home/yzwang/Remote/CR3DLoc/data/ROD2021')
     rfim = np.load(
         '/home/yzwang/Remote/CR3DLoc/data/ROD2021/sequences/train/2019_09_29_ONRD001/RADAR_RA_H/000000_0000.npy')
-    rfim_cart, _ = rf2rfcart(rfim, cruw.range_grid, cruw.angle_grid, cruw.xz_grid)
+    rfim_cart, _ = rf2rfcart(rfim, cruw.range_grid, cruw.angle_grid, cruw.xz_grid, lut=cruw.get_rf2rfcart_lut())
     rfim_cart_mag = np.sqrt(rfim_cart[:, :, 0] ** 2 + rfim_cart[:, :, 1] ** 2)
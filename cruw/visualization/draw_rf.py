@@ -1,5 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
 
 def magnitude(chirp, radar_data_type):
@@ -38,6 +37,7 @@ def draw_rf_image(chirp_data, radar_data_type, save_path=None, normalized=True):
     :param normalized: is radar data normalized or not
     :return:
     """
+    import matplotlib.pyplot as plt
     chirp_abs = magnitude(chirp_data, radar_data_type)
     if normalized:
         plt.imshow(chirp_abs, vmin=0, vmax=1, origin='lower')
@@ -63,6 +63,7 @@ def draw_centers(ax, chirp, dts, colors, texts=None, chirp_type='RISEP', normali
     :param normalized: is radar data normalized or not
     :return:
     """
+    import matplotlib.pyplot as plt
     chirp_abs = magnitude(chirp, chirp_type)
     if normalized:
         ax.imshow(chirp_abs, vmin=0, vmax=1, origin='lower')
@@ -86,6 +87,7 @@ def show_rf_cart(chirp_cart, xz_grid, normalized=True):
     :param normalized: is radar data normalized or not
     :return:
     """
+    import matplotlib.pyplot as plt
     fig = plt.figure()
     ax = fig.add_subplot(1, 1, 1)
     if normalized:
@@ -1,6 +1,4 @@
 import numpy as np
-import pycocotools.mask as cocomask
-from matplotlib.patches import Rectangle
 
 
 def draw_dets(ax, img, bboxes, colors, texts=None, masks=None):
@@ -14,6 +12,9 @@ def draw_dets(ax, img, bboxes, colors, texts=None, masks=None):
     :param masks: n_bbox rle masks
     :return:
     """
+    from matplotlib.patches import Rectangle
+    if masks is not None:
+        import pycocotools.mask as cocomask
     n_bbox = len(bboxes)
     for bbox_id in range(n_bbox):
         bbox = bboxes[bbox_id]
@@ -1,9 +1,8 @@
 import numpy as np
 import json
-import matplotlib.pyplot as plt
-from matplotlib import gridspec
 
 from cruw.mapping import ra2idx
+from cruw.io.cache import load_chirp_cached, load_image_cached
 
 from .draw_rgb import draw_dets
 from .draw_rf import draw_centers
@@ -11,9 +10,11 @@ from .utils import generate_colors_rgb
 
 
 def show_dataset(image_path, chirp_path, anno_path):
+    import matplotlib.pyplot as plt
+    from matplotlib import gridspec
     frame_id = int(image_path.split('/')[-1][:-4])
-    img = plt.imread(image_path)
-    chirp = np.load(chirp_path)
+    img = load_image_cached(image_path)
+    chirp = load_chirp_cached(chirp_path)
     anno = json.load(open(anno_path, 'rb'))
     metadata = anno['metadata'][frame_id]
 
@@ -39,23 +40,19 @@ def show_dataset(image_path, chirp_path, anno_path):
 
 
 def show_dataset_rod2021(image_path, chirp_path, anno_path, dataset):
+    import matplotlib.pyplot as plt
+    from matplotlib import gridspec
     frame_id = int(image_path.split('/')[-1][:-4])
-    img = plt.imread(image_path)
-    chirp = np.load(chirp_path)
+    img = load_image_cached(image_path)
+    chirp = load_chirp_cached(chirp_path)
     with open(anno_path, 'r') as f:
-        lines = f.readlines()
-    center_ids = []
-    categories = []
-    for line in lines:
-        fid, rng, azm, class_name = line.rstrip().split()
-        fid = int(fid)
-        if fid == frame_id:
-            rng = float(rng)
-            azm = float(azm)
-            rid, aid = ra2idx(rng, azm, dataset.range_grid, dataset.angle_grid)
-            center_ids.append([rid, aid])
-            categories.append(class_name)
-    center_ids = np.array(center_ids)
+        lines = [line.rstrip().split() for line in f.readlines()]
+    lines = [line for line in lines if int(line[0]) == frame_id]
+    rngs = np.array([float(line[1]) for line in lines])
+    azms = np.array([float(line[2]) for line in lines])
+    categories = [line[3] for line in lines]
+    rids, aids = ra2idx(rngs, azms, dataset.range_grid, dataset.angle_grid)
+    center_ids = np.stack([rids, aids], axis=1)
     n_obj = len(categories)
 
     fig = plt.figure()
@@ -0,0 +1,48 @@
+import time
+import argparse
+
+from cruw import CRUW
+from cruw.cruw import clear_shared_states
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the construction time of CRUW objects.')
+    parser.add_argument('--data_root', type=str, required=True, help='dataset root folder')
+    parser.add_argument('--config', type=str, default='sensor_config_rod2021', help='sensor config name')
+    parser.add_argument('--repeat', type=int, default=20, help='number of constructions to average')
+    return parser.parse_args()
+
+
+def eager_init(data_root, config):
+    """Construct and build every config and grid, which is what CRUW.__init__ used to do."""
+    dataset = CRUW(data_root=data_root, sensor_config_name=config)
+    dataset.object_cfg, dataset.range_grid, dataset.angle_grid, dataset.range_grid_label, dataset.xz_grid
+    return dataset
+
+
+def object_cfg_only(data_root, config):
+    """Construct and only use the object config, e.g. in evaluation workers."""
+    return CRUW(data_root=data_root, sensor_config_name=config).object_cfg
+
+
+def timeit(fn, repeat, clear):
+    total = 0.0
+    for _ in range(repeat):
+        if clear:
+            clear_shared_states()
+        tic = time.perf_counter()
+        fn()
+        total += time.perf_counter() - tic
+    return total / repeat
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    cases = [
+        ('eager, no memo (before)', lambda: eager_init(args.data_root, args.config), True),
+        ('object_cfg only, no memo', lambda: object_cfg_only(args.data_root, args.config), True),
+        ('eager, memoized', lambda: eager_init(args.data_root, args.config), False),
+        ('constructor only, memoized', lambda: CRUW(args.data_root, args.config), False),
+    ]
+    for name, fn, clear in cases:
+        print('%-28s %10.3f ms' % (name, timeit(fn, args.repeat, clear) * 1000))
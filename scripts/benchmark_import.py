@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+HEAVY_MODULES = ['scipy', 'matplotlib', 'yaml', 'pycocotools', 'pandas']
+IMPORT_MODULES = ['cruw', 'cruw.mapping', 'cruw.eval']
+
+PROBE = """
+import sys, time, json
+tic = time.perf_counter()
+import numpy
+t_numpy = time.perf_counter() - tic
+for name in %r:
+    __import__(name)
+t_total = time.perf_counter() - tic
+heavy = [name for name in %r if name in sys.modules]
+print(json.dumps(dict(t_numpy=t_numpy, t_total=t_total, heavy=heavy)))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark and guard the import time of cruw.')
+    parser.add_argument('--repeat', type=int, default=10, help='number of fresh interpreters to average')
+    parser.add_argument('--max_ms', type=float, default=150.0,
+                        help='fail if importing cruw takes longer than this on top of numpy')
+    return parser.parse_args()
+
+
+def probe():
+    """Import cruw in a fresh interpreter, return the import times and the heavy modules loaded."""
+    env = dict(os.environ)
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([repo_root, env.get('PYTHONPATH', '')])
+    code = PROBE % (IMPORT_MODULES, HEAVY_MODULES)
+    out = subprocess.check_output([sys.executable, '-c', code], env=env)
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = [probe() for _ in range(args.repeat)]
+    t_numpy = min(res['t_numpy'] for res in results) * 1000
+    t_total = min(res['t_total'] for res in results) * 1000
+    heavy = sorted(set(name for res in results for name in res['heavy']))
+    print('import %s: %.1f ms (numpy: %.1f ms, cruw: %.1f ms)' %
+          (', '.join(IMPORT_MODULES), t_total, t_numpy, t_total - t_numpy))
+    failed = False
+    if heavy:
+        print('FAIL: heavy modules imported: %s' % ', '.join(heavy))
+        failed = True
+    if t_total - t_numpy > args.max_ms:
+        print('FAIL: cruw import time %.1f ms exceeds %.1f ms' % (t_total - t_numpy, args.max_ms))
+        failed = True
+    sys.exit(1 if failed else 0)
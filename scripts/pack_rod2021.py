@@ -0,0 +1,34 @@
+import os
+import argparse
+
+from cruw import CRUW
+from cruw.io.packed import pack_sequence, get_packed_path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Pack per-frame radar chirp files into one file per sequence.')
+    parser.add_argument('--data_root', type=str, required=True, help='dataset root folder')
+    parser.add_argument('--config', type=str, default='sensor_config_rod2021', help='sensor config name')
+    parser.add_argument('--split', type=str, default=None, help='only pack this split')
+    parser.add_argument('--seqs', type=str, nargs='*', default=None, help='only pack these sequences')
+    parser.add_argument('--overwrite', action='store_true', help='overwrite existing packed files')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    dataset = CRUW(data_root=args.data_root, sensor_config_name=args.config)
+    radar_cfg = dataset.sensor_cfg.radar_cfg
+    for split, seq_names in dataset.manifest.splits.items():
+        if args.split is not None and split != args.split:
+            continue
+        for seq_name in seq_names:
+            if args.seqs is not None and seq_name not in args.seqs:
+                continue
+            seq_path = dataset.manifest.get_seq_path(seq_name)
+            pack_path = get_packed_path(seq_path, radar_cfg['chirp_folder'])
+            if os.path.exists(pack_path) and not args.overwrite:
+                print('skip %s: %s exists' % (seq_name, pack_path))
+                continue
+            print('packing %s ...' % seq_name)
+            pack_sequence(os.path.join(seq_path, radar_cfg['chirp_folder']), pack_path, radar_cfg['chirp_ids'])